@@ -1,9 +1,21 @@
 import pandas as pd
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'model'))
+from build_dataset import INCOME_RAW
+from storage import TABLES
+from validation import print_report, validate
 
-# Updated test script to verify logic and export CSV
-file_path = '/Users/williampantel/My Drive/coding-projects/datathon2026/ACSST5Y2024.S1903_2026-02-07T134855/ACSST5Y2024.S1903-Data.csv'
-output_file = '/Users/williampantel/My Drive/coding-projects/datathon2026/cleaned_median_household_income.csv'
+# Updated test script to verify logic and export CSV (the raw S1903 export
+# next to this script, and the income table path model/validation.py checks)
+file_path = INCOME_RAW
+output_file = TABLES['income']
+
+if not os.path.exists(file_path):
+    # The raw S1903 export isn't checked in: validate the committed table instead
+    report = validate(['income'])
+    print_report(report)
+    sys.exit(0 if report['passed'] else 1)
 
 try:
     # 1. Load data
@@ -26,7 +38,13 @@ try:
     # 5. Drop NA
     df_cleaned.dropna(subset=['Median_Household_Income'], inplace=True)
 
-    # 6. Export
+    # 6. Validate against the income schema (model/validation.py) before exporting
+    report = validate(['income'], frames={'income': df_cleaned})
+    print_report(report)
+    if not report['passed']:
+        raise ValueError("cleaned income table failed validation")
+
+    # 7. Export
     df_cleaned.to_csv(output_file, index=False)
     
     print(f"Final shape: {df_cleaned.shape}")
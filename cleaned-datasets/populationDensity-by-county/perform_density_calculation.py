@@ -1,8 +1,11 @@
 import pandas as pd
 import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'model'))
+from county_index import CountyIndex, fips_join, parse_geo_id
 
 # File Paths
-CWD = '/Users/williampantel/My Drive/coding-projects/datathon2026/cleaned-datasets/populationDensity-by-county'
+CWD = os.path.dirname(os.path.abspath(__file__))
 POPULATION_PATH = os.path.join(CWD, 'cleaned-population-by-county.csv')
 LAND_AREA_PATH = os.path.join(CWD, 'GEOINFO2023.GEOINFO-2026-02-07T233836.csv')
 OUTPUT_PATH = os.path.join(CWD, 'cleaned-population-density-by-county.csv')
@@ -28,9 +31,17 @@ def perform_calculation():
     
     # Drop rows with missing area
     area_df_cleaned.dropna(subset=['Land_Area_SqMi'], inplace=True)
-    
+
+    # Key both tables by integer FIPS (GEOINFO only carries names, so resolve them once)
+    pop_df['FIPS'] = parse_geo_id(pop_df['GEO_ID'])
+    area_df_cleaned['FIPS'] = CountyIndex(pop_df).fips_for_area(area_df_cleaned['County_Area'])
+    unmatched = area_df_cleaned[area_df_cleaned['FIPS'] < 0]
+    if not unmatched.empty:
+        print(f"WARNING: {len(unmatched)} land area rows have no matching GEO_ID: {unmatched['County_Area'].tolist()}")
+    area_df_cleaned = area_df_cleaned[area_df_cleaned['FIPS'] >= 0]
+
     print("Merging datasets and calculating density...")
-    merged_df = pd.merge(pop_df, area_df_cleaned, on='County_Area', how='inner')
+    merged_df = fips_join(pop_df, area_df_cleaned, columns=['Land_Area_SqMi']).drop(columns=['FIPS'])
     
     # Calculate density
     merged_df['population_density'] = merged_df['Total_Population'] / merged_df['Land_Area_SqMi']
@@ -0,0 +1,147 @@
+import argparse
+import hashlib
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from features import FEATURE_COLUMNS, INPUT_COLUMNS, build_feature_matrix
+from storage import load_table
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.pkl')
+SCALER_PATH = os.path.join(REPO_ROOT, 'scaler.pkl')
+CACHE_DIR = os.path.join(REPO_ROOT, '.attribution-cache')
+
+GROUP_COLUMNS = ['Region', 'Division', 'State']
+
+
+def _hash_bytes(*chunks):
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def compute_contributions(booster, X):
+    # TreeSHAP for every row in one call: (n_rows, n_features + 1), last column
+    # is the bias; each row sums to the model's prediction
+    return booster.predict(xgb.DMatrix(X), pred_contribs=True)
+
+
+class Attributions:
+    # Per-county TreeSHAP contributions for the whole table, cached on disk by
+    # (model, scaler, feature matrix) hash, with top-k driver queries on top
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, table=None, cache_dir=CACHE_DIR):
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+        self.booster = model.get_booster()
+        # Contribution columns, in the booster's layout: the matrix below is
+        # built in FEATURE_COLUMNS order, so a model trained on another layout
+        # (spatial or categorical features) can't be attributed with it
+        self.features = list(self.booster.feature_names or FEATURE_COLUMNS)
+        if self.features != FEATURE_COLUMNS or self.booster.num_features() != len(FEATURE_COLUMNS):
+            raise ValueError(f"Model has {self.booster.num_features()} features; attribution expects "
+                             f"the {len(FEATURE_COLUMNS)}-column FEATURE_COLUMNS layout")
+
+        if table is None:
+            table = load_table('main', columns=['State', 'County'] + INPUT_COLUMNS)
+        self.table = table.reset_index(drop=True)
+        self.names = [f'{c}, {s}' for s, c in zip(self.table['State'], self.table['County'])]
+        self.rows = {}
+        for i, name in enumerate(self.names):
+            self.rows.setdefault(name.lower(), i)
+
+        # Same scaled matrix the scorer sees (NaN -> 0, i.e. the training median)
+        self.X = np.nan_to_num(build_feature_matrix(self.table, center=scaler.center_, scale=scaler.scale_), nan=0.0)
+
+        self.key = _hash_bytes(bytes(self.booster.save_raw('ubj')), scaler.center_.tobytes(),
+                               scaler.scale_.tobytes(), self.X.tobytes())
+        self.cache_path = os.path.join(cache_dir, f'{self.key}.npz')
+        if os.path.exists(self.cache_path):
+            contributions = np.load(self.cache_path)['contributions']
+        else:
+            contributions = compute_contributions(self.booster, self.X)
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = self.cache_path + '.tmp.npz'
+            np.savez(tmp_path, contributions=contributions)
+            os.replace(tmp_path, self.cache_path)
+        self.contributions = contributions[:, :-1]
+        self.bias = contributions[:, -1]
+
+    def row_for(self, county):
+        # Row for an int row index or a 'County, State' name (case-insensitive)
+        if isinstance(county, (int, np.integer)):
+            if not 0 <= county < len(self.names):
+                raise KeyError(f"No county at row {county}")
+            return int(county)
+        if not isinstance(county, str):
+            raise TypeError(f"county must be a 'County, State' name or a row index, not {type(county).__name__}")
+        try:
+            return self.rows[county.lower()]
+        except KeyError:
+            raise KeyError(f"Unknown county: {county!r} (expected 'County, State')") from None
+
+    def county_drivers(self, county, k=5):
+        # The k features moving this county's prediction most, either direction
+        row = self.row_for(county)
+        values = self.contributions[row]
+        order = np.argsort(-np.abs(values))[:k]
+        return pd.DataFrame({
+            'feature': [self.features[j] for j in order],
+            'contribution': values[order],
+            'scaled_value': self.X[row, order],
+        })
+
+    def global_importance(self):
+        # Mean |SHAP| per feature over all counties, in AQI points
+        return pd.Series(np.abs(self.contributions).mean(axis=0), index=self.features).sort_values(ascending=False)
+
+    def group_drivers(self, by='Region', k=5):
+        # Top k features by mean |SHAP| within each group (Region, Division or
+        # State), one grouped reduction over the cached matrix
+        if by not in GROUP_COLUMNS:
+            raise ValueError(f"by must be one of {GROUP_COLUMNS}")
+        codes, groups = pd.factorize(self.table[by].astype(str))
+        n_groups = len(groups)
+        counts = np.bincount(codes, minlength=n_groups)
+        abs_sums = np.zeros((n_groups, self.contributions.shape[1]))
+        sums = np.zeros_like(abs_sums)
+        np.add.at(abs_sums, codes, np.abs(self.contributions))
+        np.add.at(sums, codes, self.contributions)
+        mean_abs = abs_sums / counts[:, None]
+        mean = sums / counts[:, None]
+
+        frames = []
+        for g in np.argsort(groups):
+            top = np.argsort(-mean_abs[g])[:k]
+            frames.append(pd.DataFrame({
+                by: groups[g],
+                'feature': [self.features[j] for j in top],
+                'mean_abs_contribution': mean_abs[g, top],
+                'mean_contribution': mean[g, top],
+                'counties': counts[g],
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-county and per-group SHAP drivers of predicted AQI")
+    parser.add_argument('--county', help="'County, State', e.g. 'Baldwin, Alabama'")
+    parser.add_argument('--by', choices=GROUP_COLUMNS, help="aggregate drivers per Region, Division or State")
+    parser.add_argument('-k', type=int, default=5, help="number of drivers to show")
+    args = parser.parse_args()
+
+    attributions = Attributions()
+    if args.county:
+        row = attributions.row_for(args.county)
+        prediction = attributions.contributions[row].sum() + attributions.bias[row]
+        print(f"{attributions.names[row]}: predicted median AQI {prediction:.2f} (base {attributions.bias[row]:.2f})")
+        print(attributions.county_drivers(row, args.k).to_string(index=False))
+    elif args.by:
+        print(attributions.group_drivers(args.by, args.k).to_string(index=False))
+    else:
+        print(attributions.global_importance().head(args.k).to_string())
@@ -0,0 +1,116 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, INPUT_COLUMNS, build_feature_matrix
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.pkl')
+SCALER_PATH = os.path.join(REPO_ROOT, 'scaler.pkl')
+
+# Rows scored per chunk; the feature buffer is allocated once at this size
+CHUNK_ROWS = 65536
+
+# Identifier columns copied through to the output when present
+ID_COLUMNS = ['State', 'County', 'Year', 'GEO_ID']
+
+
+class BatchScorer:
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, chunk_rows=CHUNK_ROWS):
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+
+        fitted_names = list(getattr(scaler, 'feature_names_in_', FEATURE_COLUMNS))
+        if fitted_names != FEATURE_COLUMNS:
+            raise ValueError(f"Scaler was fitted on an unexpected feature layout: {fitted_names}")
+
+        self.booster = model.get_booster()
+        self.chunk_rows = chunk_rows
+
+        # RobustScaler.center_ is the training median, so filling NaN with the
+        # median (as the training script does) is a zero after scaling
+        self.center = scaler.center_
+        self.scale = scaler.scale_
+
+        self._buffer = np.empty((chunk_rows, len(FEATURE_COLUMNS)), dtype=np.float32)
+
+    def score_frame(self, df):
+        # Predictions for a DataFrame with main-dataset.csv columns
+        preds = np.empty(len(df), dtype=np.float32)
+        for start in range(0, len(df), self.chunk_rows):
+            chunk = df.iloc[start:start + self.chunk_rows]
+            preds[start:start + len(chunk)] = self._score_chunk(chunk)
+        return preds
+
+    def _score_chunk(self, chunk):
+        X = build_feature_matrix(chunk, out=self._buffer, center=self.center, scale=self.scale)
+        np.nan_to_num(X, copy=False, nan=0.0)
+        return self.booster.inplace_predict(X)
+
+    def score_file(self, input_path, output_path):
+        # Stream input_path through the model chunk by chunk, appending to output_path
+        writer = _ChunkWriter(output_path)
+        total = 0
+        try:
+            for chunk in iter_chunks(input_path, self.chunk_rows):
+                result = chunk[[c for c in ID_COLUMNS if c in chunk.columns]].reset_index(drop=True)
+                result['predicted_median_aqi'] = self._score_chunk(chunk)
+                writer.write(result)
+                total += len(chunk)
+        finally:
+            writer.close()
+        return total
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    columns = INPUT_COLUMNS + ID_COLUMNS
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        available = [c for c in columns if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=available):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, usecols=lambda c: c in columns)
+
+
+class _ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, df):
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode='a' if self._wrote_header else 'w',
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score county rows with best_xgboost_model.pkl")
+    parser.add_argument('input', help="CSV or Parquet file with main-dataset.csv columns")
+    parser.add_argument('output', help="CSV or Parquet file to write predictions to")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    scorer = BatchScorer(chunk_rows=args.chunk_rows)
+    n = scorer.score_file(args.input, args.output)
+    print(f"Scored {n} rows -> {args.output}")
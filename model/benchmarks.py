@@ -0,0 +1,263 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from profiling import peak_rss_mb, reset_peak_rss
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.pkl')
+SCALER_PATH = os.path.join(REPO_ROOT, 'scaler.pkl')
+HISTORY_PATH = os.path.join(REPO_ROOT, 'model', 'benchmark-history.jsonl')
+
+# ~3,200 US counties; synthetic datasets are this many rows times each scale
+BASE_ROWS = 3200
+SCALES = [1, 10, 100]
+
+# Hyperparameter search is timed only at these scales (it dominates run time):
+# the original GridSearchCV over REDUCED_PARAM_GRID, then run_search as the
+# training script runs it, over the same grid and folds with the grid's
+# largest n_estimators as its round ceiling
+SEARCH_SCALES = [1]
+SEARCH_METHOD = 'hyperband'
+SEARCH_MAX_FITS = 400
+
+# Single-row predictions timed per scale
+SINGLE_ROW_CALLS = 200
+
+# A stage counts as regressed when it is this much slower than the median of
+# the last HISTORY_WINDOW comparable runs (and at least MIN_REGRESSION_SECONDS)
+REGRESSION_TOLERANCE = 1.25
+MIN_REGRESSION_SECONDS = 0.005
+HISTORY_WINDOW = 5
+
+# Multiplicative noise applied to the resampled numeric columns
+NOISE_SIGMA = 0.05
+
+RACE_COLUMNS = [
+    '% Hispanic or Latino', '% White alone', '% Black or African American alone',
+    '% American Indian and Alaska Native alone', '% Asian alone', '% Two or More Races',
+]
+
+
+def synthetic_dataset(n_rows, seed=42):
+    # main-dataset style table of n_rows counties: real rows resampled with
+    # noise on the numeric inputs and the derived columns recomputed
+    from features import FALLBACK_EXPRESSIONS, INPUT_COLUMNS, evaluate_features
+    from storage import load_table
+
+    base = load_table('main', columns=INPUT_COLUMNS + ['median_aqi'])
+    for column in ['Region', 'Division']:
+        base[column] = base[column].astype(str)
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), size=n_rows)].reset_index(drop=True)
+
+    noisy = ['Median_Household_Income', 'Total_Population', 'Land_Area_SqMi', 'median_aqi'] + RACE_COLUMNS
+    for column in noisy:
+        df[column] = df[column] * rng.lognormal(0, NOISE_SIGMA, size=n_rows)
+    df[RACE_COLUMNS] = df[RACE_COLUMNS].clip(upper=100)
+    df['Total_Population'] = df['Total_Population'].round()
+    df['population_density'] = df['Total_Population'] / df['Land_Area_SqMi']
+
+    derived = list(FALLBACK_EXPRESSIONS)
+    values = evaluate_features(df.drop(columns=derived), derived)
+    for column in derived:
+        df[column] = values[column]
+    return df
+
+
+def _measure(stage, func, repeat=3):
+    # Best-of-repeat wall time plus peak RSS and peak traced (Python/NumPy)
+    # memory. Memory comes from a first, traced call; with repeat > 1 that call
+    # is a warm-up and only the untraced calls are timed.
+    cumulative = not reset_peak_rss()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    times = [time.perf_counter() - start]
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss = peak_rss_mb()
+    if repeat > 1:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+    record = {
+        'stage': stage,
+        'seconds': min(times),
+        'repeat': repeat,
+        'peak_rss_mb': round(peak_rss, 1),
+        # Peak since process start, not per stage, where RSS can't be reset
+        'peak_rss_cumulative': cumulative,
+        'traced_peak_mb': round(traced_peak / 2**20, 1),
+    }
+    return record, result
+
+
+def run_scale(scale, search=False, seed=42):
+    # All stage timings for one synthetic dataset size (run in a fresh process)
+    import joblib
+    import pandas as pd
+    from sklearn.model_selection import GridSearchCV, train_test_split
+    from xgboost import XGBRegressor
+
+    from batch_scoring import BatchScorer
+    from features import FEATURE_COLUMNS, create_features, encode_features
+    from fold_cache import get_fold_cache
+    from hyperparameter_search import REDUCED_PARAM_GRID, run_search
+
+    n_rows = BASE_ROWS * scale
+    df = synthetic_dataset(n_rows, seed=seed)
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    records = []
+
+    record, df_features = _measure('create_features', lambda: create_features(df))
+    records.append(record)
+    record, _ = _measure('get_dummies', lambda: pd.get_dummies(df_features, columns=['Region', 'Division']))
+    records.append(record)
+    record, df_encoded = _measure('encode_features', lambda: encode_features(df_features))
+    records.append(record)
+
+    X = df_encoded[FEATURE_COLUMNS]
+    X = X.fillna(pd.Series(scaler.center_, index=FEATURE_COLUMNS))
+    record, X_scaled = _measure('scaler_transform', lambda: scaler.transform(X))
+    records.append(record)
+
+    def predict_single():
+        for i in range(SINGLE_ROW_CALLS):
+            model.predict(X_scaled[i:i + 1])
+
+    record, _ = _measure('predict_single', predict_single)
+    record['seconds'] /= SINGLE_ROW_CALLS
+    records.append(record)
+    record, _ = _measure('predict_batch', lambda: model.predict(X_scaled))
+    records.append(record)
+
+    scorer = BatchScorer()
+    record, _ = _measure('batch_scorer', lambda: scorer.score_frame(df))
+    records.append(record)
+
+    if search:
+        X_train, _, y_train, _ = train_test_split(X_scaled, df['median_aqi'].to_numpy(), test_size=0.2, random_state=42)
+        record, folds = _measure('fold_cache', lambda: get_fold_cache(X_train, y_train, n_splits=5, seed=42).folds, repeat=1)
+        records.append(record)
+        grid = REDUCED_PARAM_GRID
+        grid_search = GridSearchCV(XGBRegressor(random_state=42, n_jobs=-1), grid, cv=5, scoring='r2', n_jobs=-1)
+        record, _ = _measure('grid_search_cv', lambda: grid_search.fit(X_train, y_train), repeat=1)
+        records.append(record)
+        record, _ = _measure('search', lambda: run_search(grid, X_train, y_train, folds=folds, method=SEARCH_METHOD,
+                                                        max_fits=SEARCH_MAX_FITS, max_rounds=max(grid['n_estimators']),
+                                                        seed=42), repeat=1)
+        records.append(record)
+
+    for record in records:
+        record['scale'] = scale
+        record['rows'] = n_rows
+    return records
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def run_benchmarks(scales=SCALES, search_scales=SEARCH_SCALES, seed=42):
+    # Each scale runs in its own process (platform default start method), so
+    # peak memory isn't inherited from a larger earlier scale
+    import xgboost as xgb
+
+    results = []
+    for scale in scales:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results.extend(pool.submit(run_scale, scale, scale in search_scales, seed).result())
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'host': platform.node(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'xgboost': xgb.__version__,
+        'model_sha256': _file_hash(MODEL_PATH),
+        'results': results,
+    }
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(run, path=HISTORY_PATH):
+    with open(path, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+
+def find_regressions(run, history, tolerance=REGRESSION_TOLERANCE, window=HISTORY_WINDOW):
+    # Stages slower than the median of recent runs on the same host and CPU count
+    comparable = [h for h in history if h.get('host') == run['host'] and h.get('cpus') == run['cpus']][-window:]
+    regressions = []
+    for record in run['results']:
+        previous = [r['seconds'] for h in comparable for r in h['results']
+                    if r['stage'] == record['stage'] and r['rows'] == record['rows']]
+        if not previous:
+            continue
+        baseline = float(np.median(previous))
+        if record['seconds'] > baseline * tolerance and record['seconds'] - baseline > MIN_REGRESSION_SECONDS:
+            regressions.append({**record, 'baseline_seconds': baseline, 'ratio': record['seconds'] / baseline})
+    return regressions
+
+
+def print_run(run):
+    print(f"{'scale':>5} {'rows':>8} {'stage':<18} {'seconds':>10} {'peak RSS MB':>12} {'traced MB':>10}")
+    for r in run['results']:
+        mark = '*' if r.get('peak_rss_cumulative') else ' '
+        print(f"{r['scale']:>5} {r['rows']:>8} {r['stage']:<18} {r['seconds']:>10.4f} "
+              f"{r['peak_rss_mb']:>11.1f}{mark} {r['traced_peak_mb']:>10.1f}")
+    if any(r.get('peak_rss_cumulative') for r in run['results']):
+        print("* peak RSS since the scale's process started (it can't be reset per stage on this platform)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and profile feature engineering, scoring and search on synthetic data")
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help="dataset sizes as multiples of ~3,200 counties")
+    parser.add_argument('--search-scales', type=int, nargs='*', default=SEARCH_SCALES, help="scales at which to time the hyperparameter search")
+    parser.add_argument('--history', default=HISTORY_PATH, help="JSON-lines file the run is appended to")
+    parser.add_argument('--no-record', action='store_true', help="don't append this run to the history file")
+    parser.add_argument('--check', action='store_true', help="exit non-zero if any stage regressed against the history")
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    run = run_benchmarks(args.scales, args.search_scales)
+    print_run(run)
+
+    regressions = find_regressions(run, history)
+    for r in regressions:
+        print(f"REGRESSION: {r['stage']} at {r['rows']} rows took {r['seconds']:.4f}s "
+              f"vs {r['baseline_seconds']:.4f}s ({r['ratio']:.2f}x)")
+    if not args.no_record:
+        append_history(run, args.history)
+        print(f"\nAppended results to {args.history}")
+    if args.check and regressions:
+        raise SystemExit(1)
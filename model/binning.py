@@ -0,0 +1,57 @@
+import numpy as np
+
+# Same as fold_cache.MAX_BIN; bin codes then fit in a uint8 per value
+MAX_BIN = 256
+
+
+class FeatureBins:
+    # Quantile cut points per feature from XGBoost's own sketch
+    # (QuantileDMatrix.get_quantile_cut), computed once on the training
+    # matrix and saved with the model. transform() replaces each numeric
+    # value by its bin index, so the CV folds, extra models, refreshes and
+    # predictions all see the same bins, and re-quantizing the codes is
+    # lossless: training on them gives the same trees as on the values.
+    # Categorical ('c') columns already hold category codes and pass through.
+    def __init__(self, indptr, values, feature_names, feature_types):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.feature_names = list(feature_names)
+        self.feature_types = list(feature_types)
+
+    @classmethod
+    def fit(cls, X, feature_names, feature_types, max_bin=MAX_BIN):
+        import xgboost as xgb
+        dmatrix = xgb.QuantileDMatrix(np.asarray(X, dtype=np.float32), feature_types=feature_types,
+                                      enable_categorical=True, max_bin=max_bin)
+        indptr, values = dmatrix.get_quantile_cut()
+        return cls(indptr, values, feature_names, feature_types)
+
+    def cuts(self, j):
+        return self.values[self.indptr[j]:self.indptr[j + 1]]
+
+    def transform(self, X, out=None):
+        # float32 bin codes (NaN stays missing); out may alias X
+        X = np.asarray(X)
+        if out is None:
+            out = np.empty(X.shape, dtype=np.float32)
+        for j, kind in enumerate(self.feature_types):
+            column = X[:, j].astype(np.float32)
+            if kind == 'q':
+                codes = np.searchsorted(self.cuts(j), column, side='right').astype(np.float32)
+                column = np.where(np.isnan(column), np.nan, codes)
+            out[:, j] = column
+        return out
+
+    def to_arrays(self):
+        # For an .npz sidecar (see export_model.export_native)
+        return {
+            'cut_indptr': self.indptr,
+            'cut_values': self.values,
+            'feature_names': np.array(self.feature_names),
+            'feature_types': np.array(self.feature_types),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['cut_indptr'], arrays['cut_values'],
+                   arrays['feature_names'].tolist(), arrays['feature_types'].tolist())
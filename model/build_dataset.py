@@ -0,0 +1,367 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from county_index import CountyIndex, fips_join, parse_geo_id
+from storage import write_table
+from validation import SCHEMAS, failures, print_report, validate
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(REPO_ROOT, 'cleaned-datasets')
+CACHE_DIR = os.path.join(REPO_ROOT, '.build-cache')
+MANIFEST_PATH = os.path.join(CACHE_DIR, 'manifest.json')
+REPORT_PATH = os.path.join(CACHE_DIR, 'validation-report.json')
+
+AQI_DIR = os.path.join(DATA_DIR, 'aqi-by-county')
+INCOME_DIR = os.path.join(DATA_DIR, 'household-income-by-county')
+POPULATION_DIR = os.path.join(DATA_DIR, 'populationDensity-by-county')
+RACE_DIR = os.path.join(DATA_DIR, 'race-by-county')
+
+# Raw exports (ACS S1903 and DP05 raw files are not checked in; their stages
+# fall back to the cleaned CSVs as source when the raw file is absent)
+AQI_RAW = os.path.join(AQI_DIR, 'Access_to_a_Livable_Planet_Dataset.csv')
+INCOME_RAW = os.path.join(INCOME_DIR, 'ACSST5Y2024.S1903_2026-02-07T134855', 'ACSST5Y2024.S1903-Data.csv')
+POPULATION_RAW = os.path.join(POPULATION_DIR, 'ACSDT5Y2024.B01003_2026-02-07T182244', 'ACSDT5Y2024.B01003-Data.csv')
+RACE_RAW = os.path.join(RACE_DIR, 'ACSDP5Y2024.DP05-Data.csv')
+GEOINFO_RAW = os.path.join(POPULATION_DIR, 'GEOINFO2023.GEOINFO-2026-02-07T233836.csv')
+
+# Cleaned outputs (also the fallback sources above)
+AQI_CLEANED = os.path.join(AQI_DIR, 'Access_to_a_Livable_Planet_Dataset_cleaned.csv')
+ML_TARGET = os.path.join(AQI_DIR, 'ml_target_dataset.csv')
+EPA_COUNTY_FIPS = os.path.join(AQI_DIR, 'epa-county-fips.csv')
+INCOME_CLEANED = os.path.join(INCOME_DIR, 'cleaned-income-by-county.csv')
+POPULATION_CLEANED = os.path.join(POPULATION_DIR, 'cleaned-population-by-county.csv')
+DENSITY_CLEANED = os.path.join(POPULATION_DIR, 'cleaned-population-density-by-county.csv')
+COUNTY_POINTS = os.path.join(POPULATION_DIR, 'county-internal-points.csv')
+RACE_CLEANED = os.path.join(RACE_DIR, 'cleaned-race-by-county.csv')
+MAIN_DATASET = os.path.join(REPO_ROOT, 'main-dataset', 'main-dataset.csv')
+
+# Sample weight reference: counties with >= 180 monitored days get full weight
+REFERENCE_DAYS = 180
+
+RACE_COLUMNS = {
+    'DP05_0090PE': '% Hispanic or Latino',
+    'DP05_0096PE': '% White alone',
+    'DP05_0097PE': '% Black or African American alone',
+    'DP05_0098PE': '% American Indian and Alaska Native alone',
+    'DP05_0099PE': '% Asian alone',
+    'DP05_0102PE': '% Two or More Races',
+}
+
+# Census Bureau regions and divisions
+STATE_DIVISIONS = {
+    'New England': ['Connecticut', 'Maine', 'Massachusetts', 'New Hampshire', 'Rhode Island', 'Vermont'],
+    'Middle Atlantic': ['New Jersey', 'New York', 'Pennsylvania'],
+    'East North Central': ['Illinois', 'Indiana', 'Michigan', 'Ohio', 'Wisconsin'],
+    'West North Central': ['Iowa', 'Kansas', 'Minnesota', 'Missouri', 'Nebraska', 'North Dakota', 'South Dakota'],
+    'South Atlantic': ['Delaware', 'District of Columbia', 'Florida', 'Georgia', 'Maryland',
+                       'North Carolina', 'South Carolina', 'Virginia', 'West Virginia'],
+    'East South Central': ['Alabama', 'Kentucky', 'Mississippi', 'Tennessee'],
+    'West South Central': ['Arkansas', 'Louisiana', 'Oklahoma', 'Texas'],
+    'Mountain': ['Arizona', 'Colorado', 'Idaho', 'Montana', 'Nevada', 'New Mexico', 'Utah', 'Wyoming'],
+    'Pacific': ['Alaska', 'California', 'Hawaii', 'Oregon', 'Washington'],
+}
+DIVISION_REGIONS = {
+    'New England': 'Northeast', 'Middle Atlantic': 'Northeast',
+    'East North Central': 'Midwest', 'West North Central': 'Midwest',
+    'South Atlantic': 'South', 'East South Central': 'South', 'West South Central': 'South',
+    'Mountain': 'West', 'Pacific': 'West',
+}
+
+
+def _to_number(series, strip=(',', '+')):
+    values = series.astype(str)
+    for ch in strip:
+        values = values.str.replace(ch, '', regex=False)
+    return pd.to_numeric(values.str.replace('−', '-', regex=False), errors='coerce')
+
+
+# ---------------------------------------------------------------------------
+# Stages: each takes a dict of upstream DataFrames and returns its own table
+
+def clean_population(upstream):
+    df = pd.read_csv(POPULATION_RAW, skiprows=[1], usecols=['GEO_ID', 'NAME', 'B01003_001E'], encoding='utf-8-sig')
+    df['B01003_001E'] = _to_number(df['B01003_001E'], strip=(',', '+', '*'))
+    df = df.rename(columns={'NAME': 'County_Area', 'B01003_001E': 'Total_Population'})
+    df = df.dropna(subset=['Total_Population'])
+    df['Total_Population'] = df['Total_Population'].astype(int)
+    return df
+
+
+def clean_income(upstream):
+    if not os.path.exists(INCOME_RAW):
+        return pd.read_csv(INCOME_CLEANED)
+    df = pd.read_csv(INCOME_RAW, skiprows=[1], usecols=['GEO_ID', 'NAME', 'S1903_C03_001E'], encoding='utf-8-sig')
+    df['S1903_C03_001E'] = _to_number(df['S1903_C03_001E'])
+    df = df.rename(columns={'NAME': 'County_Area', 'S1903_C03_001E': 'Median_Household_Income'})
+    return df.dropna(subset=['Median_Household_Income'])
+
+
+def clean_race(upstream):
+    if not os.path.exists(RACE_RAW):
+        return pd.read_csv(RACE_CLEANED)
+    df = pd.read_csv(RACE_RAW, skiprows=[1], usecols=['GEO_ID', 'NAME'] + list(RACE_COLUMNS),
+                     encoding='utf-8-sig', low_memory=False)
+    df = df[df['GEO_ID'].astype(str).str.startswith('0500000US')].copy()
+    for col in RACE_COLUMNS:
+        df[col] = pd.to_numeric(df[col].astype(str).str.replace(r'[,*()X-]', '', regex=True).str.strip(),
+                                errors='coerce')
+    df = df.rename(columns={'NAME': 'County_Area', **RACE_COLUMNS})
+    return df.dropna(subset=list(RACE_COLUMNS.values()))
+
+
+def clean_geoinfo(upstream):
+    # Land area plus the county internal point; strips thousands separators
+    # and the Unicode minus used in INTPTLON
+    df = pd.read_csv(GEOINFO_RAW, encoding='utf-8-sig', dtype=str)
+    df = df.rename(columns={
+        'Geographic Area Name (NAME)': 'County_Area',
+        'Area (Land, in square miles) (AREALAND_SQMI)': 'Land_Area_SqMi',
+        'Internal Point (Latitude) (INTPTLAT)': 'Latitude',
+        'Internal Point (Longitude) (INTPTLON)': 'Longitude',
+    })[['County_Area', 'Land_Area_SqMi', 'Latitude', 'Longitude']]
+    for col in ['Land_Area_SqMi', 'Latitude', 'Longitude']:
+        df[col] = _to_number(df[col])
+    return df.dropna(subset=['Land_Area_SqMi'])
+
+
+def compute_density(upstream):
+    # GEOINFO carries names only: key it to FIPS once, then join on the integer code
+    population = upstream['population'].copy()
+    population['FIPS'] = parse_geo_id(population['GEO_ID'])
+    area = upstream['geoinfo'][['County_Area', 'Land_Area_SqMi']].copy()
+    area['FIPS'] = CountyIndex(population).fips_for_area(area['County_Area'])
+    area = area[area['FIPS'] >= 0]
+    df = fips_join(population, area, columns=['Land_Area_SqMi']).drop(columns=['FIPS'])
+    df['population_density'] = df['Total_Population'] / df['Land_Area_SqMi']
+    return df
+
+
+def build_county_points(upstream):
+    # FIPS-keyed internal point and density of every county, for spatial features
+    density = upstream['density'].copy()
+    density['FIPS'] = parse_geo_id(density['GEO_ID'])
+    points = upstream['geoinfo'][['County_Area', 'Latitude', 'Longitude']].copy()
+    points['FIPS'] = CountyIndex(density).fips_for_area(points['County_Area'])
+    points = points[(points['FIPS'] >= 0) & points['Latitude'].notna() & points['Longitude'].notna()]
+    df = fips_join(points, density, columns=['population_density'])
+    return df[['FIPS', 'County_Area', 'Latitude', 'Longitude', 'population_density']].sort_values('FIPS').reset_index(drop=True)
+
+
+def clean_aqi(upstream):
+    df = pd.read_csv(AQI_RAW)
+    df['County'] = df['County'].str.strip()
+    df['State'] = df['State'].str.strip()
+    return df
+
+
+def build_aqi_target(upstream):
+    df = upstream['aqi'].copy()
+    df['median_aqi'] = df['Median AQI']
+    df['sample_weight'] = np.minimum(1.0, df['Days with AQI'] / REFERENCE_DAYS)
+    return df[['State', 'County', 'Year', 'median_aqi', 'sample_weight']]
+
+
+def build_county_index(upstream):
+    # EPA State/County names -> FIPS, resolved once against the ACS county names
+    return CountyIndex(upstream['population']).epa_table(upstream['aqi'])
+
+
+def _with_fips(df):
+    df = df.drop(columns=['County_Area'])
+    df.insert(0, 'FIPS', parse_geo_id(df.pop('GEO_ID')))
+    return df
+
+
+def build_main_dataset(upstream):
+    index = upstream['county_index']
+    fips = dict(zip(zip(index['State'], index['County']), index['FIPS']))
+    df = upstream['aqi_target'].copy()
+    df.insert(2, 'FIPS', [fips.get(key, -1) for key in zip(df['State'], df['County'])])
+    # Expected misses: Connecticut's 8 former counties (the ACS now reports its
+    # planning regions instead) and EPA sites outside the ACS county
+    # universe (SONORA, Mexico; St John, Virgin Islands). They are dropped.
+    unmatched = df[df['FIPS'] < 0]
+    if len(unmatched):
+        print(f"No FIPS code for {len(unmatched)} EPA counties (dropped): "
+              f"{', '.join(unmatched['County'] + ' (' + unmatched['State'] + ')')}")
+    df = df[df['FIPS'] >= 0]
+
+    for name in ['race', 'income', 'density']:
+        df = fips_join(df, _with_fips(upstream[name]))
+
+    state_division = {state: division for division, states in STATE_DIVISIONS.items() for state in states}
+    df['Region'] = df['State'].map(state_division).map(DIVISION_REGIONS)
+    df['Division'] = df['State'].map(state_division)
+    df['log_population_density'] = np.log1p(df['population_density'])
+    df['log_median_income'] = np.log(df['Median_Household_Income'])
+    df['total_minority_pct'] = df['% Hispanic or Latino'] + df['% Black or African American alone']
+
+    df = df.dropna(subset=['Region'])
+    return df[['State', 'County', 'FIPS', 'Year', 'median_aqi', 'sample_weight'] + list(RACE_COLUMNS.values()) + [
+        'Median_Household_Income', 'Total_Population', 'Land_Area_SqMi', 'population_density',
+        'Region', 'Division', 'log_population_density', 'log_median_income', 'total_minority_pct',
+    ]].reset_index(drop=True)
+
+
+class Stage:
+    def __init__(self, name, func, inputs=(), deps=(), export=None, table=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.deps = list(deps)
+        self.export = export
+        self.table = table
+
+
+# Stage DAG, in topological order
+STAGES = [
+    Stage('population', clean_population, inputs=[POPULATION_RAW], export=POPULATION_CLEANED, table='population'),
+    Stage('income', clean_income, inputs=[INCOME_RAW, INCOME_CLEANED]),
+    Stage('race', clean_race, inputs=[RACE_RAW, RACE_CLEANED]),
+    Stage('geoinfo', clean_geoinfo, inputs=[GEOINFO_RAW]),
+    Stage('density', compute_density, deps=['population', 'geoinfo'], export=DENSITY_CLEANED, table='density'),
+    Stage('county_points', build_county_points, deps=['density', 'geoinfo'],
+          export=COUNTY_POINTS, table='county_points'),
+    Stage('aqi', clean_aqi, inputs=[AQI_RAW], export=AQI_CLEANED, table='aqi'),
+    Stage('aqi_target', build_aqi_target, deps=['aqi'], export=ML_TARGET, table='ml_target'),
+    Stage('county_index', build_county_index, deps=['population', 'aqi'],
+          export=EPA_COUNTY_FIPS, table='county_index'),
+    Stage('main', build_main_dataset, deps=['aqi_target', 'county_index', 'race', 'income', 'density'],
+          export=MAIN_DATASET, table='main'),
+]
+
+
+def _load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    return {'files': {}, 'stages': {}}
+
+
+def _file_digest(path, manifest):
+    # Content hash of an input file, reusing the previous digest while size and mtime are unchanged
+    if not os.path.exists(path):
+        return 'missing'
+    stat = os.stat(path)
+    cached = manifest['files'].get(path)
+    if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+        return cached['sha256']
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    manifest['files'][path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': h.hexdigest()}
+    return h.hexdigest()
+
+
+def _fingerprint(stage, manifest, fingerprints):
+    # Stage code + input file contents + upstream fingerprints
+    h = hashlib.sha256(stage.name.encode())
+    h.update(inspect.getsource(stage.func).encode())
+    for path in stage.inputs:
+        h.update(_file_digest(path, manifest).encode())
+    for dep in stage.deps:
+        h.update(fingerprints[dep].encode())
+    return h.hexdigest()[:16]
+
+
+def _cache_path(stage, fingerprint):
+    return os.path.join(CACHE_DIR, f'{stage.name}-{fingerprint}.parquet')
+
+
+def run(targets=None, force=False, export=True, dry_run=False, check=True):
+    # Rebuild only stages whose fingerprint changed; returns {stage: 'cached' | 'built' | 'stale'}.
+    # With check, every requested table is validated afterwards (freshly built
+    # frames directly, cached ones from the columnar store) and a failed check
+    # raises after the report is written to REPORT_PATH.
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    manifest = _load_manifest()
+    stages = {s.name: s for s in STAGES}
+
+    # Restrict to the requested targets and everything upstream of them
+    wanted = set(stages) if not targets else set()
+    pending = list(targets or [])
+    while pending:
+        name = pending.pop()
+        if name not in stages:
+            raise ValueError(f"Unknown stage '{name}'. Choose from {list(stages)}")
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(stages[name].deps)
+
+    fingerprints = {}
+    frames = {}
+    status = {}
+    for stage in STAGES:
+        if stage.name not in wanted:
+            continue
+        fingerprints[stage.name] = fp = _fingerprint(stage, manifest, fingerprints)
+        path = _cache_path(stage, fp)
+        if not force and os.path.exists(path):
+            status[stage.name] = 'cached'
+            if export and stage.export and not os.path.exists(stage.export) and not dry_run:
+                pd.read_parquet(path).to_csv(stage.export, index=False)
+            continue
+
+        if dry_run:
+            status[stage.name] = 'stale'
+            continue
+        status[stage.name] = 'built'
+        upstream = {}
+        for dep in stage.deps:
+            if dep not in frames:
+                frames[dep] = pd.read_parquet(_cache_path(stages[dep], fingerprints[dep]))
+            upstream[dep] = frames[dep]
+        print(f"Building {stage.name}...")
+        frames[stage.name] = df = stage.func(upstream)
+        df.to_parquet(path, index=False)
+
+        previous = manifest['stages'].get(stage.name)
+        if previous and previous != fp and os.path.exists(_cache_path(stage, previous)):
+            os.remove(_cache_path(stage, previous))
+        manifest['stages'][stage.name] = fp
+
+        if export and stage.export:
+            df.to_csv(stage.export, index=False)
+            print(f"Exported {len(df)} records to {os.path.relpath(stage.export, REPO_ROOT)}")
+            if stage.table:
+                write_table(stage.table, df)
+
+    if not dry_run:
+        with open(MANIFEST_PATH, 'w') as f:
+            json.dump(manifest, f, indent=1)
+
+    if check and not dry_run:
+        tables = {stage.table or stage.name: stage.name for stage in STAGES
+                  if stage.name in wanted and (stage.table or stage.name) in SCHEMAS}
+        report = validate(tables, frames={table: frames[name] for table, name in tables.items() if name in frames})
+        with open(REPORT_PATH, 'w') as f:
+            json.dump(report, f, indent=1)
+        failed = failures(report)
+        if failed:
+            print_report(report)
+            raise ValueError(f"Validation failed for {sorted({name for name, _ in failed})}; see {REPORT_PATH}")
+        print(f"Validated {len(tables)} tables in {report['seconds']:.3f}s")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally rebuild cleaned-datasets and main-dataset.csv")
+    parser.add_argument('targets', nargs='*', help=f"Stages to build (default: all). One of {[s.name for s in STAGES]}")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if inputs are unchanged")
+    parser.add_argument('--no-export', action='store_true', help="Only update the cache, don't rewrite CSVs")
+    parser.add_argument('--dry-run', action='store_true', help="Show which stages would rebuild")
+    parser.add_argument('--no-validate', action='store_true', help="Skip validating the built tables")
+    args = parser.parse_args()
+
+    status = run(args.targets, force=args.force, export=not args.no_export, dry_run=args.dry_run,
+                 check=not args.no_validate)
+    for name, state in status.items():
+        print(f"{name:12s} {state}")
@@ -0,0 +1,131 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Geography suffixes in ACS County_Area names, longest first
+ACS_SUFFIXES = [
+    'city and borough', 'census area', 'planning region', 'municipality',
+    'municipio', 'county', 'parish', 'borough',
+]
+
+# EPA (State, County) names that normalization can't resolve -> ACS County_Area
+EPA_OVERRIDES = {
+    ('Virginia', 'Charles'): 'Charles City County, Virginia',
+    ('Puerto Rico', 'Mayagnez'): 'Mayagüez Municipio, Puerto Rico',
+}
+
+
+def parse_geo_id(geo_id):
+    # '0500000US01001' -> 1001 (state FIPS * 1000 + county FIPS), as int32
+    codes = pd.Series(geo_id).astype(str).str[-5:]
+    return pd.to_numeric(codes, errors='raise').astype(np.int32).to_numpy()
+
+
+def state_fips(fips):
+    return np.asarray(fips) // 1000
+
+
+def _normalize(name):
+    # Case, accents, punctuation and Saint/St. spellings folded together
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    name = name.lower().replace('.', '').replace("'", '')
+    name = re.sub(r'\bsaint\b', 'st', name)
+    name = re.sub(r'\bsainte\b', 'ste', name)
+    return re.sub(r'\s+', ' ', name).strip()
+
+
+def _acs_key(county_area):
+    # 'Baltimore city, Maryland' -> ('maryland', 'baltimore', 'city')
+    county, state = county_area.rsplit(', ', 1)
+    county = _normalize(county)
+    kind = 'county'
+    if county.endswith(' city') and not county.endswith(' county'):
+        county, kind = county[:-len(' city')], 'city'
+    else:
+        for suffix in ACS_SUFFIXES:
+            if county.endswith(' ' + suffix):
+                county = county[:-len(suffix) - 1]
+                break
+    return _normalize(state), county, kind
+
+
+def _epa_candidates(state, county):
+    # Lookup keys to try, in order, for an EPA State/County pair
+    state = _normalize(state)
+    county = _normalize(county)
+    base = re.sub(r'\s*\(city\)$|\s+city$', '', county)
+    if base != county:
+        return [(state, base, 'city'), (state, county, 'county')]
+    return [(state, county, 'county'), (state, county, 'city')]
+
+
+class CountyIndex:
+    # Name -> FIPS lookup built from an ACS table's GEO_ID/County_Area pairs
+    def __init__(self, acs_table):
+        self.fips_by_area = dict(zip(acs_table['County_Area'], parse_geo_id(acs_table['GEO_ID'])))
+        self.fips_by_key = {}
+        for area, fips in self.fips_by_area.items():
+            self.fips_by_key.setdefault(_acs_key(area), fips)
+
+    def fips_for_area(self, county_area):
+        # ACS-style names ('Autauga County, Alabama'); -1 where unknown
+        return np.array([self.fips_by_area.get(a, -1) for a in county_area], dtype=np.int32)
+
+    def fips_for_epa(self, state, county):
+        # EPA State/County names ('Maryland', 'Baltimore (City)'); -1 where unknown
+        out = np.full(len(state), -1, dtype=np.int32)
+        for i, (s, c) in enumerate(zip(state, county)):
+            override = EPA_OVERRIDES.get((s, c))
+            if override is not None:
+                out[i] = self.fips_by_area.get(override, -1)
+                continue
+            for key in _epa_candidates(s, c):
+                if key in self.fips_by_key:
+                    out[i] = self.fips_by_key[key]
+                    break
+        return out
+
+    def epa_table(self, epa):
+        # Persistable State/County -> FIPS mapping for every distinct EPA county
+        pairs = epa[['State', 'County']].drop_duplicates().reset_index(drop=True)
+        pairs['FIPS'] = self.fips_for_epa(pairs['State'], pairs['County'])
+        return pairs
+
+
+def align(keys, index_keys):
+    # Row positions in index_keys for each key (-1 where missing), via a
+    # sorted integer search instead of a string hash join
+    index_keys = np.asarray(index_keys)
+    order = np.argsort(index_keys, kind='stable')
+    sorted_keys = index_keys[order]
+    if len(sorted_keys) > 1 and (sorted_keys[1:] == sorted_keys[:-1]).any():
+        raise ValueError("FIPS join key is not unique in the right-hand table")
+    keys = np.asarray(keys)
+    pos = np.searchsorted(sorted_keys, keys)
+    pos = np.minimum(pos, max(len(sorted_keys) - 1, 0))
+    found = (len(sorted_keys) > 0) & (sorted_keys[pos] == keys)
+    return np.where(found, order[pos], -1)
+
+
+def fips_join(left, right, how='inner', columns=None):
+    # left.merge(right, on='FIPS') for a right table with unique FIPS codes
+    if columns is None:
+        columns = [c for c in right.columns if c != 'FIPS' and c not in left.columns]
+    idx = align(left['FIPS'].to_numpy(), right['FIPS'].to_numpy())
+    if how == 'inner':
+        keep = idx >= 0
+        left, idx = left[keep], idx[keep]
+    elif how != 'left':
+        raise ValueError("how must be 'inner' or 'left'")
+    out = left.reset_index(drop=True)
+    matched = idx >= 0
+    for col in columns:
+        values = right[col].to_numpy()
+        if matched.all():
+            out[col] = values[idx]
+        else:
+            column = pd.Series(values[np.where(matched, idx, 0)]).where(matched)
+            out[col] = column.to_numpy()
+    return out
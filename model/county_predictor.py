@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit
+
+import joblib
+import numpy as np
+
+from features import (
+    BASE_FEATURES, COLUMN_ALIASES, FALLBACK_EXPRESSIONS, FEATURE_COLUMNS, INPUT_COLUMNS,
+    build_feature_matrix, conflicting_inputs, evaluate_row, features_depending_on,
+)
+from storage import load_table
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.pkl')
+SCALER_PATH = os.path.join(REPO_ROOT, 'scaler.pkl')
+
+# Recent (county, changes) results kept in memory
+CACHE_SIZE = 4096
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8050
+
+
+class CountyPredictor:
+    # Warm, in-process predictor for "median AQI of county X under changed
+    # inputs". The booster and scaler parameters stay resident, every county's
+    # scaled 39-feature vector is built once from main-dataset.csv, and a
+    # request only recomputes the features that depend on the changed columns.
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, table=None, cache_size=CACHE_SIZE):
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+        if list(getattr(scaler, 'feature_names_in_', FEATURE_COLUMNS)) != FEATURE_COLUMNS:
+            raise ValueError("Scaler was fitted on an unexpected feature layout")
+        self.booster = model.get_booster()
+        self.booster.set_param({'nthread': 1})
+        self.center = scaler.center_
+        self.scale = scaler.scale_
+
+        if table is None:
+            table = load_table('main', columns=['State', 'County'] + INPUT_COLUMNS)
+        self.table = table.reset_index(drop=True)
+        self.names = [f'{c}, {s}' for s, c in zip(self.table['State'], self.table['County'])]
+        # main-dataset.csv has a few repeated State/County names (e.g. Baltimore
+        # city and county); the first row wins and the rest stay reachable by row
+        self.rows = {}
+        for i, name in enumerate(self.names):
+            self.rows.setdefault(name.lower(), i)
+
+        self.inputs = self.table[BASE_FEATURES].to_numpy(dtype=np.float64)
+        # NaN scales to 0 (RobustScaler.center_ is the training median)
+        self.vectors = np.nan_to_num(build_feature_matrix(self.table, center=self.center, scale=self.scale), nan=0.0)
+        self.base_predictions = self.booster.inplace_predict(self.vectors)
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._plans = {}
+
+    def row_for(self, county):
+        # Row for an int row index or a 'County, State' name (case-insensitive)
+        if isinstance(county, (int, np.integer)):
+            if not 0 <= county < len(self.names):
+                raise KeyError(f"No county at row {county}")
+            return int(county)
+        if not isinstance(county, str):
+            raise TypeError(f"county must be a 'County, State' name or a row index, not {type(county).__name__}")
+        try:
+            return self.rows[county.lower()]
+        except KeyError:
+            raise KeyError(f"Unknown county: {county!r} (expected 'County, State')") from None
+
+    def _plan(self, columns):
+        # (features to recompute, their FEATURE_COLUMNS positions, derived columns
+        # to recompute from the changed inputs) for a set of changed columns, memoized
+        plan = self._plans.get(columns)
+        if plan is None:
+            features = features_depending_on(columns)
+            positions = np.array([FEATURE_COLUMNS.index(f) for f in features], dtype=np.intp)
+            stale = [c for c in FALLBACK_EXPRESSIONS if c not in columns and c in features]
+            plan = self._plans[columns] = (features, positions, stale)
+        return plan
+
+    def predict(self, county, changes=None, deltas=None):
+        # Predicted median AQI for one county. changes sets input columns to new
+        # values and deltas adds to them; both accept column names or the
+        # feature aliases (e.g. {'income': 60000}, {'density': 50}).
+        row = self.row_for(county)
+        updates = _resolve(changes)
+        additions = _resolve(deltas)
+        if not updates and not additions:
+            return float(self.base_predictions[row])
+
+        key = (row, tuple(sorted(updates.items())), tuple(sorted(additions.items())))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        inputs = dict(zip(BASE_FEATURES, self.inputs[row]))
+        inputs.update(updates)
+        for column, delta in additions.items():
+            inputs[column] = inputs[column] + delta
+
+        changed = frozenset(updates) | frozenset(additions)
+        # Density is rebuilt from changed population/land area, so it can't also be changed
+        conflicts = conflicting_inputs(changed)
+        if conflicts:
+            raise ValueError(f"{conflicts} are derived from other changed inputs; change one or the other")
+        features, positions, stale = self._plan(changed)
+        for column in stale:
+            del inputs[column]
+        values = evaluate_row(inputs, features)
+        raw = np.array([values[f] for f in features], dtype=np.float64)
+        vector = self.vectors[row].copy()
+        vector[positions] = np.nan_to_num((raw - self.center[positions]) / self.scale[positions], nan=0.0)
+
+        prediction = float(self.booster.inplace_predict(vector[None, :])[0])
+        self._cache[key] = prediction
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return prediction
+
+
+def _resolve(changes):
+    # {alias or column: value} -> {column: float}, rejecting non-numeric inputs
+    if changes is not None and not isinstance(changes, dict):
+        raise TypeError(f"expected {{input: value}}, not {type(changes).__name__}")
+    resolved = {}
+    for name, value in (changes or {}).items():
+        column = COLUMN_ALIASES.get(name, name)
+        if column not in BASE_FEATURES:
+            raise KeyError(f"Cannot change {name!r}; numeric inputs are {sorted(COLUMN_ALIASES)}")
+        resolved[column] = float(value)
+    return resolved
+
+
+# Local HTTP front end
+def _body_error(county, changes, deltas):
+    # Message for a POST body of the wrong shape, or None: county is a name or
+    # row index, changes/deltas are objects of numbers
+    if county is not None and (isinstance(county, bool) or not isinstance(county, (str, int))):
+        return "'county' must be a 'County, State' string or a row index"
+    for key, values in [('changes', changes), ('deltas', deltas)]:
+        if values is None:
+            continue
+        if not isinstance(values, dict):
+            return f"'{key}' must be an object of input: number"
+        for name, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return f"'{key}.{name}' must be a number"
+    return None
+
+
+def _response(status, payload):
+    body = json.dumps(payload).encode()
+    reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}[status]
+    head = (f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n\r\n')
+    return head.encode() + body
+
+
+def _handle(predictor, method, target, body):
+    # GET /predict?county=Baldwin,+Alabama&income=60000&delta.density=10
+    # POST /predict {"county": ..., "changes": {...}, "deltas": {...}}
+    url = urlsplit(target)
+    if url.path != '/predict':
+        return _response(404, {'error': f'unknown path {url.path}'})
+    try:
+        if method == 'POST':
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict):
+                return _response(400, {'error': 'expected a JSON object'})
+            county = request.get('county')
+            changes = request.get('changes')
+            deltas = request.get('deltas')
+            error = _body_error(county, changes, deltas)
+            if error is not None:
+                return _response(400, {'error': error})
+        else:
+            query = dict(parse_qsl(url.query))
+            county = query.pop('county', None)
+            deltas = {k[len('delta.'):]: v for k, v in query.items() if k.startswith('delta.')}
+            changes = {k: v for k, v in query.items() if not k.startswith('delta.')}
+    except ValueError as e:
+        return _response(400, {'error': str(e)})
+    if county is None:
+        return _response(400, {'error': "missing 'county'"})
+    try:
+        row = predictor.row_for(county)
+    except KeyError as e:
+        return _response(404, {'error': e.args[0]})
+    except TypeError as e:
+        return _response(400, {'error': str(e)})
+    try:
+        prediction = predictor.predict(row, changes, deltas)
+    except (KeyError, ValueError, TypeError) as e:
+        return _response(400, {'error': str(e.args[0] if e.args else e)})
+    return _response(200, {'county': predictor.names[row], 'predicted_median_aqi': prediction})
+
+
+async def _serve_connection(predictor, reader, writer):
+    # Minimal HTTP/1.1 with keep-alive; one request at a time per connection
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+            body = await reader.readexactly(length) if length else b''
+            writer.write(_handle(predictor, method, target, body))
+            await writer.drain()
+            if headers.get('connection', '').lower() == 'close':
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(predictor, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = await asyncio.start_server(lambda r, w: _serve_connection(predictor, r, w), host, port)
+    print(f"Serving predictions on http://{host}:{port}/predict")
+    async with server:
+        await server.serve_forever()
+
+
+def _parse_assignments(pairs):
+    out = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition('=')
+        out[name] = float(value)
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict a county's median AQI under changed inputs")
+    parser.add_argument('county', nargs='?', help="'County, State', e.g. 'Baldwin, Alabama'")
+    parser.add_argument('--set', nargs='*', metavar='COLUMN=VALUE', help="set an input, e.g. income=60000")
+    parser.add_argument('--delta', nargs='*', metavar='COLUMN=VALUE', help="add to an input, e.g. density=25")
+    parser.add_argument('--serve', action='store_true', help="run the local HTTP front end")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', action='store_true', help="report single-request latency over all counties")
+    args = parser.parse_args()
+
+    predictor = CountyPredictor()
+    if args.serve:
+        asyncio.run(serve(predictor, args.host, args.port))
+    elif args.latency:
+        rng = np.random.default_rng(42)
+        timings = []
+        for row in rng.integers(0, len(predictor.names), size=5000):
+            start = time.perf_counter()
+            predictor.predict(int(row), deltas={'income': float(rng.integers(-20, 20)) * 1000})
+            timings.append(time.perf_counter() - start)
+        p50, p99 = np.percentile(timings, [50, 99]) * 1e6
+        print(f"Single-county predict: p50 {p50:.0f}µs, p99 {p99:.0f}µs")
+    else:
+        if args.county is None:
+            parser.error("county is required unless --serve or --latency is given")
+        base = predictor.predict(args.county)
+        prediction = predictor.predict(args.county, _parse_assignments(args.set), _parse_assignments(args.delta))
+        print(f"{args.county}: predicted median AQI {prediction:.2f} (baseline {base:.2f})")
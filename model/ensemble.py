@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import xgboost as xgb
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENSEMBLE_PATH = os.path.join(REPO_ROOT, 'ensemble_model.pkl')
+
+# Lower bound, median and upper bound of a 90% prediction interval
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+def quantile_params(params, quantiles=QUANTILES):
+    # Params for one booster with an output per quantile ('reg:quantileerror'
+    # with a quantile_alpha vector), so every quantile comes from one predict
+    return {**params, 'objective': 'reg:quantileerror', 'quantile_alpha': list(quantiles)}
+
+
+def stack_boosters(boosters):
+    # Merge single-output boosters into one multi-target booster whose output
+    # j is member j: trees are concatenated and tagged with their member in
+    # tree_info, so one inplace_predict walks every member's trees in a single
+    # pass over the input instead of N predict calls
+    models = [json.loads(b.save_raw('json')) for b in boosters]
+    for m in models:
+        if m['learner']['learner_model_param']['num_target'] != '1':
+            raise ValueError("stack_boosters expects single-output boosters")
+    trees = [m['learner']['gradient_booster']['model']['trees'] for m in models]
+
+    merged, tree_info, iteration_indptr = [], [], [0]
+    for k in range(max(len(t) for t in trees)):
+        for member, member_trees in enumerate(trees):
+            if k < len(member_trees):
+                tree = dict(member_trees[k])
+                tree['id'] = len(merged)
+                merged.append(tree)
+                tree_info.append(member)
+        iteration_indptr.append(len(merged))
+
+    stacked = models[0]
+    model = stacked['learner']['gradient_booster']['model']
+    model['trees'] = merged
+    model['tree_info'] = tree_info
+    model['iteration_indptr'] = iteration_indptr
+    model['gbtree_model_param']['num_trees'] = str(len(merged))
+    # base_score is stored as '[v]'; keep each member's text to stay bit-exact
+    learner_params = stacked['learner']['learner_model_param']
+    base_scores = [m['learner']['learner_model_param']['base_score'].strip('[]') for m in models]
+    learner_params['base_score'] = '[' + ','.join(base_scores) + ']'
+    learner_params['num_target'] = str(len(models))
+
+    booster = xgb.Booster()
+    booster.load_model(bytearray(json.dumps(stacked).encode()))
+    return booster
+
+
+class Ensemble:
+    # A stacked bootstrap ensemble or a multi-quantile booster behind one
+    # batched predict. kind is 'bootstrap' (members are resampled fits) or
+    # 'quantile' (members are the QUANTILES outputs).
+    def __init__(self, booster, kind, quantiles=QUANTILES):
+        if kind not in ('bootstrap', 'quantile'):
+            raise ValueError("kind must be 'bootstrap' or 'quantile'")
+        self.booster = booster
+        self.kind = kind
+        self.quantiles = tuple(quantiles)
+
+    @property
+    def label(self):
+        # Bootstrap percentiles only spread the fitted mean (model variance,
+        # no residual noise), so they are not a prediction interval and cover
+        # far fewer than 90% of actual values
+        width = round((self.quantiles[-1] - self.quantiles[0]) * 100)
+        if self.kind == 'bootstrap':
+            return f'{width}% model-variance band'
+        return f'{width}% prediction interval'
+
+    @classmethod
+    def from_bootstrap(cls, boosters, quantiles=QUANTILES):
+        return cls(stack_boosters(boosters), 'bootstrap', quantiles)
+
+    @classmethod
+    def from_quantile_booster(cls, booster, quantiles=QUANTILES):
+        return cls(booster, 'quantile', quantiles)
+
+    def predict_members(self, X):
+        # (n_rows, n_members) predictions from a single inplace_predict
+        preds = self.booster.inplace_predict(X)
+        return preds.reshape(len(preds), -1)
+
+    def predict_interval(self, X):
+        # (n_rows, len(quantiles)) lower/median/upper per row. Bootstrap
+        # intervals are percentiles over members (model variance only);
+        # quantile outputs are sorted so crossing quantiles stay ordered.
+        members = self.predict_members(X)
+        if self.kind == 'bootstrap':
+            return np.percentile(members, np.asarray(self.quantiles) * 100, axis=1).T
+        return np.sort(members, axis=1)
+
+
+def interval_coverage(y, interval):
+    # Share of rows whose actual value falls inside [first, last] quantile
+    y = np.asarray(y)
+    return float(np.mean((y >= interval[:, 0]) & (y <= interval[:, -1])))
+
+
+if __name__ == "__main__":
+    from batch_scoring import BatchScorer
+    from features import build_feature_matrix
+    from storage import load_table
+
+    parser = argparse.ArgumentParser(description="Score every county with a prediction interval (or model-variance band)")
+    parser.add_argument('--ensemble', default=ENSEMBLE_PATH, help="ensemble saved by improved_xgboost_model.py")
+    parser.add_argument('--output', default=None, help="optional CSV for State, County and the interval")
+    args = parser.parse_args()
+
+    ensemble = joblib.load(args.ensemble)
+    scorer = BatchScorer()
+    df = load_table('main')
+    X = np.nan_to_num(build_feature_matrix(df, center=scorer.center, scale=scorer.scale), nan=0.0)
+
+    start = time.perf_counter()
+    scorer.booster.inplace_predict(X)
+    single_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    interval = ensemble.predict_interval(X)
+    ensemble_seconds = time.perf_counter() - start
+
+    n_members = ensemble.predict_members(X[:1]).shape[1]
+    print(f"{ensemble.kind} ensemble with {n_members} outputs: {ensemble_seconds * 1000:.1f}ms "
+          f"vs {single_seconds * 1000:.1f}ms for the single model ({len(df)} counties)")
+    print(f"Mean {ensemble.label} width: "
+          f"{np.mean(interval[:, -1] - interval[:, 0]):.2f} AQI, "
+          f"covers {interval_coverage(df['median_aqi'], interval):.1%} of counties")
+
+    if args.output:
+        out = df[['State', 'County']].copy()
+        for j, q in enumerate(ensemble.quantiles):
+            out[f'aqi_q{int(q * 100):02d}'] = interval[:, j]
+        out.to_csv(args.output, index=False)
+        print(f"Saved intervals to '{args.output}'")
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+
+import joblib
+import numpy as np
+import xgboost as xgb
+
+from features import FEATURE_COLUMNS, NUMERIC_FEATURES
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.pkl')
+SCALER_PATH = os.path.join(REPO_ROOT, 'scaler.pkl')
+NATIVE_MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.ubj')
+SIDECAR_PATH = os.path.join(REPO_ROOT, 'scaler.npz')
+FOLDED_MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.folded.ubj')
+
+
+def export_native(model, scaler, model_path=NATIVE_MODEL_PATH, sidecar_path=SIDECAR_PATH, bins=None):
+    # Booster as UBJSON plus the scaler's center_/scale_ as an .npz sidecar;
+    # exact: fast_model.FastModel reproduces the pickled model's predictions.
+    # A model trained on binning.FeatureBins codes (NATIVE_FEATURE_COLUMNS
+    # layout) also gets the bins in the sidecar.
+    expected = FEATURE_COLUMNS if bins is None else NUMERIC_FEATURES
+    fitted_names = list(getattr(scaler, 'feature_names_in_', expected))
+    if fitted_names != expected:
+        raise ValueError(f"Scaler was fitted on an unexpected feature layout: {fitted_names}")
+    feature_names = FEATURE_COLUMNS if bins is None else bins.feature_names
+    booster = model.get_booster().copy()
+    booster.feature_names = feature_names
+    booster.save_model(model_path)
+    arrays = {} if bins is None else bins.to_arrays()
+    arrays.update(center=scaler.center_, scale=scaler.scale_, feature_names=np.array(feature_names))
+    np.savez(sidecar_path, **arrays)
+    return model_path, sidecar_path
+
+
+def _raw_threshold(threshold, center, scale):
+    # Smallest float32 raw value x with float32((x - center) / scale) >= threshold,
+    # so `x < result` on raw input matches `scaled < threshold`
+    def scaled(x):
+        return np.float32((np.float64(x) - center) / scale)
+
+    x = np.float32(np.float64(threshold) * scale + center)
+    if scaled(x) >= threshold:
+        below = np.nextafter(x, np.float32(-np.inf))
+        while scaled(below) >= threshold:
+            x, below = below, np.nextafter(below, np.float32(-np.inf))
+        return x
+    while scaled(x) < threshold:
+        x = np.nextafter(x, np.float32(np.inf))
+    return x
+
+
+def fold_scaler(booster, center, scale):
+    # Rewrite every split threshold from scaled to raw feature units and send
+    # missing values the way the median (0 after scaling) went, so the booster
+    # takes raw features with NaN directly. Approximate: raw values are rounded
+    # to float32 before the comparison instead of after scaling, which moves
+    # counties sitting exactly on a split (see --fold in the CLI output).
+    model = json.loads(booster.save_raw('json'))
+    for tree in model['learner']['gradient_booster']['model']['trees']:
+        conditions = tree['split_conditions']
+        for node, (left, feature) in enumerate(zip(tree['left_children'], tree['split_indices'])):
+            if left == -1:
+                continue
+            threshold = np.float32(conditions[node])
+            conditions[node] = float(_raw_threshold(threshold, center[feature], scale[feature]))
+            tree['default_left'][node] = int(np.float32(0) < threshold)
+    folded = xgb.Booster()
+    folded.load_model(bytearray(json.dumps(model).encode()))
+    folded.feature_names = FEATURE_COLUMNS
+    return folded
+
+
+if __name__ == "__main__":
+    from features import build_feature_matrix
+    from fast_model import FastModel
+    from storage import load_table
+
+    parser = argparse.ArgumentParser(description="Export the pickled model and scaler to native XGBoost/NumPy files")
+    parser.add_argument('--fold', action='store_true', help="also write a single booster with the scaler folded into its thresholds")
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    export_native(model, scaler)
+    print(f"Saved booster to '{NATIVE_MODEL_PATH}' ({os.path.getsize(NATIVE_MODEL_PATH) // 1024} KB) "
+          f"and scaler to '{SIDECAR_PATH}'")
+
+    # Check the exports against the pickles on every county
+    df = load_table('main')
+    X_raw = build_feature_matrix(df, out=np.empty((len(df), len(FEATURE_COLUMNS))))
+    expected = model.get_booster().inplace_predict(
+        np.nan_to_num(build_feature_matrix(df, center=scaler.center_, scale=scaler.scale_), nan=0.0))
+    exported = FastModel().predict(X_raw)
+    print(f"Native export: {int((exported != expected).sum())} of {len(df)} predictions differ")
+
+    if args.fold:
+        folded = fold_scaler(model.get_booster(), scaler.center_, scaler.scale_)
+        folded.save_model(FOLDED_MODEL_PATH)
+        diff = np.abs(FastModel(FOLDED_MODEL_PATH, None).predict(X_raw) - expected)
+        print(f"Saved folded booster to '{FOLDED_MODEL_PATH}': {int((diff > 0).sum())} of {len(df)} "
+              f"predictions differ (max {diff.max():.3f} AQI)")
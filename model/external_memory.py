@@ -0,0 +1,212 @@
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from xgboost import XGBRegressor
+
+from features import FEATURE_COLUMNS, INPUT_COLUMNS, build_feature_matrix
+from fold_cache import MAX_BIN
+from hyperparameter_search import native_params
+from streaming_scaler import StreamingRobustScaler
+from storage import load_table
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.pkl')
+
+# Rows per Parquet shard written by write_shards
+ROWS_PER_SHARD = 100000
+
+LABEL = 'median_aqi'
+
+# Hyperparameters of the committed best_xgboost_model.pkl
+TUNED_PARAM_NAMES = [
+    'n_estimators', 'max_depth', 'learning_rate', 'min_child_weight', 'subsample',
+    'colsample_bytree', 'gamma', 'reg_alpha', 'reg_lambda',
+]
+
+
+def tuned_params(model_path=MODEL_PATH):
+    model = joblib.load(model_path)
+    return {name: getattr(model, name) for name in TUNED_PARAM_NAMES if getattr(model, name, None) is not None}
+
+
+def write_shards(df, directory, rows_per_shard=ROWS_PER_SHARD):
+    # Split a main-dataset style table into numbered Parquet shards
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, start in enumerate(range(0, len(df), rows_per_shard)):
+        path = os.path.join(directory, f'part-{i:05d}.parquet')
+        df.iloc[start:start + rows_per_shard].to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def shard_paths(directory):
+    paths = sorted(glob.glob(os.path.join(directory, '*.parquet')))
+    if not paths:
+        raise FileNotFoundError(f"No .parquet shards in {directory}")
+    return paths
+
+
+def _read_shard(path, extra_columns=()):
+    columns = list(dict.fromkeys(INPUT_COLUMNS + [LABEL] + list(extra_columns)))
+    return pd.read_parquet(path, columns=columns)
+
+
+def _holdout_mask(n_rows, shard, test_size, seed):
+    # Deterministic per-row test assignment, so every pass sees the same split
+    # without holding an index of the whole dataset
+    return np.random.default_rng([seed, shard]).random(n_rows) < test_size
+
+
+def fit_streaming_stats(paths, test_size=0.2, seed=42, extra_columns=()):
+    # One pass over the training rows: per-feature quantile sketches give the
+    # train_median fill and RobustScaler center_/scale_ without materializing X.
+    # extra_columns are sketched after the 39 features, so the saved scaler
+    # covers every column the model is trained on.
+    extra_columns = list(extra_columns)
+    width = len(FEATURE_COLUMNS) + len(extra_columns)
+    scaler = StreamingRobustScaler()
+    buffer = None
+    for shard, path in enumerate(paths):
+        df = _read_shard(path, extra_columns)
+        train = ~_holdout_mask(len(df), shard, test_size, seed)
+        if buffer is None or len(buffer) < len(df):
+            buffer = np.empty((len(df), width), dtype=np.float64)
+        build_feature_matrix(df, out=buffer)
+        X = buffer[:len(df)]
+        X[:, len(FEATURE_COLUMNS):] = df[extra_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        scaler.partial_fit(X[train])
+    scaler.feature_names_in_ = np.array(FEATURE_COLUMNS + extra_columns, dtype=object)
+    return scaler
+
+
+class ShardIter(xgb.DataIter):
+    # Feeds one shard at a time to XGBoost: features built and scaled in
+    # float64, cast to float32, missing values set to the median (0 after
+    # scaling); extra_columns are appended and scaled the same way, with
+    # center/scale covering FEATURE_COLUMNS followed by extra_columns
+    def __init__(self, paths, center, scale, cache_dir, split='train', test_size=0.2, seed=42, extra_columns=()):
+        self.paths = paths
+        self.center = center
+        self.scale = scale
+        self.split = split
+        self.test_size = test_size
+        self.seed = seed
+        self.extra_columns = list(extra_columns)
+        self._batches = None
+        super().__init__(cache_prefix=None if cache_dir is None else os.path.join(cache_dir, split))
+
+    def batches(self):
+        # (X, y) per shard for the selected split, also used for streamed evaluation
+        for shard, path in enumerate(self.paths):
+            df = _read_shard(path, self.extra_columns)
+            test = _holdout_mask(len(df), shard, self.test_size, self.seed)
+            mask = test if self.split == 'test' else ~test
+            if mask.any():
+                yield self._matrix(df[mask])
+
+    def _matrix(self, df):
+        n = len(FEATURE_COLUMNS)
+        X = build_feature_matrix(df, center=self.center[:n], scale=self.scale[:n])
+        if self.extra_columns:
+            extra = df[self.extra_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+            X = np.hstack([X, ((extra - self.center[n:]) / self.scale[n:]).astype(np.float32)])
+        np.nan_to_num(X, copy=False, nan=0.0)
+        return X, df[LABEL].to_numpy(dtype=np.float32)
+
+    def next(self, input_data):
+        if self._batches is None:
+            self._batches = self.batches()
+        batch = next(self._batches, None)
+        if batch is None:
+            return False
+        input_data(data=batch[0], label=batch[1])
+        return True
+
+    def reset(self):
+        self._batches = None
+
+
+def evaluate_streaming(booster, batches):
+    # R², RMSE, MAE and the README's within-10/12 AQI shares from running sums
+    n = sum_y = sum_y2 = sse = sae = within_10 = within_12 = 0.0
+    for X, y in batches:
+        y = y.astype(np.float64)
+        error = booster.inplace_predict(X).astype(np.float64) - y
+        n += len(y)
+        sum_y += y.sum()
+        sum_y2 += (y ** 2).sum()
+        sse += (error ** 2).sum()
+        sae += np.abs(error).sum()
+        within_10 += (np.abs(error) <= 10).sum()
+        within_12 += (np.abs(error) <= 12).sum()
+    ss_tot = sum_y2 - sum_y ** 2 / n
+    return {
+        'n': int(n), 'r2': 1 - sse / ss_tot, 'rmse': np.sqrt(sse / n), 'mae': sae / n,
+        'within_10': within_10 / n, 'within_12': within_12 / n,
+    }
+
+
+def train_external(directory, params=None, test_size=0.2, seed=42, extra_columns=(), n_jobs=-1):
+    # Two streamed passes (statistics, then quantization into XGBoost's
+    # external-memory cache); at most one shard is in memory at a time
+    paths = shard_paths(directory)
+    if params is None:
+        params = tuned_params()
+
+    start = time.perf_counter()
+    scaler = fit_streaming_stats(paths, test_size, seed, extra_columns)
+    center, scale = scaler.center_, scaler.scale_
+    print(f"Streamed statistics for {scaler.n_samples_seen_} training rows from {len(paths)} shards "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    with tempfile.TemporaryDirectory(prefix='xgb-extmem-') as cache_dir:
+        train_iter = ShardIter(paths, center, scale, cache_dir, 'train', test_size, seed, extra_columns)
+        dtrain = xgb.ExtMemQuantileDMatrix(train_iter, max_bin=MAX_BIN, nthread=n_jobs)
+        booster = xgb.train(native_params(params, seed, n_jobs), dtrain,
+                            num_boost_round=params.get('n_estimators', 100))
+        del dtrain
+
+    test_iter = ShardIter(paths, center, scale, None, 'test', test_size, seed, extra_columns)
+    metrics = evaluate_streaming(booster, test_iter.batches())
+
+    model = XGBRegressor(random_state=seed, n_jobs=n_jobs, **params)
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model, scaler.to_robust_scaler(), metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Out-of-core training over Parquet shards")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    shard_parser = subparsers.add_parser('shard', help="write a columnar-store table as Parquet shards")
+    shard_parser.add_argument('directory')
+    shard_parser.add_argument('--table', default='main')
+    shard_parser.add_argument('--rows-per-shard', type=int, default=ROWS_PER_SHARD)
+
+    train_parser = subparsers.add_parser('train', help="train the tuned model from a shard directory")
+    train_parser.add_argument('directory')
+    train_parser.add_argument('--extra-columns', nargs='*', default=[],
+                              help="numeric shard columns appended to the 39 features and scaled with them, e.g. Year")
+    train_parser.add_argument('--model-out', default='external_xgboost_model.pkl')
+    train_parser.add_argument('--scaler-out', default='external_scaler.pkl')
+    args = parser.parse_args()
+
+    if args.command == 'shard':
+        paths = write_shards(load_table(args.table), args.directory, args.rows_per_shard)
+        print(f"Wrote {len(paths)} shards to {args.directory}")
+    else:
+        model, scaler, metrics = train_external(args.directory, extra_columns=args.extra_columns)
+        print(f"Test R²: {metrics['r2']:.4f}  RMSE: {metrics['rmse']:.4f}  MAE: {metrics['mae']:.4f} (n={metrics['n']})")
+        print(f"Within 10 AQI points: {metrics['within_10']:.2%}  within 12: {metrics['within_12']:.2%}")
+        joblib.dump(model, args.model_out)
+        joblib.dump(scaler, args.scaler_out)
+        print(f"Saved model to '{args.model_out}' and scaler to '{args.scaler_out}'")
@@ -0,0 +1,120 @@
+import ctypes
+import importlib.util
+import json
+import os
+
+import numpy as np
+
+from binning import FeatureBins
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.ubj')
+SIDECAR_PATH = os.path.join(REPO_ROOT, 'scaler.npz')
+
+_LIB = None
+
+
+def _library():
+    # libxgboost through ctypes. Importing the xgboost package would also load
+    # sklearn and pandas (~1.3s); only its libpath.py is run, for the same
+    # library search the package does.
+    global _LIB
+    if _LIB is None:
+        package = importlib.util.find_spec('xgboost').submodule_search_locations[0]
+        spec = importlib.util.spec_from_file_location('_xgboost_libpath', os.path.join(package, 'libpath.py'))
+        libpath = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(libpath)
+        _LIB = ctypes.cdll.LoadLibrary(libpath.find_lib_path()[0])
+        _LIB.XGBGetLastError.restype = ctypes.c_char_p
+    return _LIB
+
+
+def _check(code):
+    if code != 0:
+        raise RuntimeError(_library().XGBGetLastError().decode())
+
+
+class NativeBooster:
+    # The Booster calls scoring needs (load, feature names, inplace predict on
+    # a dense float32 array) over XGBoost's C API
+    def __init__(self, model_file):
+        self.handle = ctypes.c_void_p()
+        _check(_library().XGBoosterCreate(None, ctypes.c_uint64(0), ctypes.byref(self.handle)))
+        _check(_library().XGBoosterLoadModel(self.handle, os.fsencode(model_file)))
+
+    def __del__(self):
+        if self.handle:
+            _library().XGBoosterFree(self.handle)
+
+    @property
+    def feature_names(self):
+        length = ctypes.c_uint64()
+        names = ctypes.POINTER(ctypes.c_char_p)()
+        _check(_library().XGBoosterGetStrFeatureInfo(self.handle, b'feature_name',
+                                                     ctypes.byref(length), ctypes.byref(names)))
+        return [names[i].decode() for i in range(length.value)] or None
+
+    def inplace_predict(self, X):
+        # Same call and arguments as xgboost.Booster.inplace_predict on a
+        # NumPy array (NaN is missing); one prediction per row
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        interface = {'data': [X.ctypes.data, True], 'shape': list(X.shape), 'strides': None,
+                     'typestr': '<f4', 'version': 3}
+        config = {'type': 0, 'training': False, 'iteration_begin': 0, 'iteration_end': 0,
+                  'strict_shape': False, 'missing': float('nan'), 'cache_id': 0}
+        shape = ctypes.POINTER(ctypes.c_uint64)()
+        dims = ctypes.c_uint64()
+        preds = ctypes.POINTER(ctypes.c_float)()
+        _check(_library().XGBoosterPredictFromDense(
+            self.handle, json.dumps(interface).encode(), json.dumps(config).encode(), None,
+            ctypes.byref(shape), ctypes.byref(dims), ctypes.byref(preds)))
+        shape = tuple(shape[i] for i in range(dims.value))
+        out = np.ctypeslib.as_array(preds, (int(np.prod(shape)),)).copy()
+        return out if len(shape) < 2 or shape[1] == 1 else out.reshape(shape)
+
+
+class FastModel:
+    # Scoring from the native exports written by export_model.py, using only
+    # NumPy and the XGBoost library (not the xgboost package's Python layer). X is the unscaled 39-feature matrix (FEATURE_COLUMNS
+    # order, NaN for missing), e.g. build_feature_matrix(df) in float64; for a
+    # categorical export it is the NATIVE_FEATURE_COLUMNS matrix
+    # (build_feature_matrix(df, features=model.feature_names)).
+    def __init__(self, model_path=MODEL_PATH, sidecar_path=SIDECAR_PATH):
+        self.booster = NativeBooster(model_path)
+        self.bins = None
+        if sidecar_path is None:
+            # Scaler folded into the split thresholds: raw features go straight in
+            self.center = self.scale = None
+            self.feature_names = self.booster.feature_names
+        else:
+            with np.load(sidecar_path, allow_pickle=False) as sidecar:
+                self.center = sidecar['center']
+                self.scale = sidecar['scale']
+                self.feature_names = sidecar['feature_names'].tolist()
+                if 'cut_values' in sidecar.files:
+                    # Booster trained on bin codes of the scaled features
+                    self.bins = FeatureBins.from_arrays(sidecar)
+
+    def transform(self, X):
+        # Same arithmetic as scaler.transform on median-imputed input: scale
+        # in float64, missing -> 0 (the training median), then cast to float32.
+        # Category-code columns follow the scaled block and stay as they are.
+        X = np.array(X, dtype=np.float64)
+        numeric = X[:, :len(self.center)]
+        numeric -= self.center
+        numeric /= self.scale
+        np.nan_to_num(numeric, copy=False, nan=0.0)
+        X = X.astype(np.float32)
+        if self.bins is not None:
+            self.bins.transform(X, out=X)
+        return X
+
+    def predict(self, X):
+        if self.center is None:
+            return self.booster.inplace_predict(np.asarray(X, dtype=np.float32))
+        return self.booster.inplace_predict(self.transform(X))
+
+
+def load(model_path=MODEL_PATH, sidecar_path=SIDECAR_PATH):
+    return FastModel(model_path, sidecar_path)
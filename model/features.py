@@ -0,0 +1,297 @@
+import ast
+
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+# Columns carried over from main-dataset.csv (in training order)
+BASE_FEATURES = [
+    'sample_weight',
+    '% Hispanic or Latino', '% White alone', '% Black or African American alone',
+    '% American Indian and Alaska Native alone', '% Asian alone', '% Two or More Races',
+    'Median_Household_Income', 'Total_Population', 'Land_Area_SqMi',
+    'population_density',
+
+    # Previously engineered features
+    'log_population_density', 'log_median_income', 'total_minority_pct',
+]
+
+# Short identifiers for the base columns, used inside feature expressions
+COLUMN_ALIASES = {
+    'weight': 'sample_weight',
+    'hispanic': '% Hispanic or Latino',
+    'white': '% White alone',
+    'black': '% Black or African American alone',
+    'native': '% American Indian and Alaska Native alone',
+    'asian': '% Asian alone',
+    'multiracial': '% Two or More Races',
+    'income': 'Median_Household_Income',
+    'population': 'Total_Population',
+    'land_area': 'Land_Area_SqMi',
+    'density': 'population_density',
+    'log_density': 'log_population_density',
+    'log_income': 'log_median_income',
+    'minority': 'total_minority_pct',
+}
+
+# Used when an input table doesn't carry the previously engineered columns,
+# and to keep them consistent when a what-if changes what they derive from
+# (in dependency order: density before log density)
+FALLBACK_EXPRESSIONS = {
+    'population_density': 'population / land_area',
+    'log_population_density': 'log1p(density)',
+    'log_median_income': 'log(income)',
+    'total_minority_pct': 'hispanic + black',
+}
+
+# Feature registry: every engineered column is a named expression over the
+# base column aliases (in training order)
+FEATURE_EXPRESSIONS = {
+    # Interaction features
+    'income_per_capita': 'income / (population + 1)',
+    'urban_income': 'density * income / 1000000',
+    'minority_density': 'minority * density / 100',
+
+    # Polynomial features
+    'pop_density_squared': 'density ** 2',
+    'log_density_squared': 'log_density ** 2',
+
+    # Ratio features
+    'white_to_minority_ratio': 'white / (minority + 0.1)',
+    'income_to_density_ratio': 'income / (density + 1)',
+
+    # Specific demographic interactions
+    'hispanic_density': 'hispanic * density / 100',
+    'black_density': 'black * density / 100',
+    'asian_density': 'asian * density / 100',
+
+    # Income-demographic interactions
+    'minority_income': 'minority * income / 100000',
+    'white_income': 'white * income / 100000',
+}
+
+ENGINEERED_FEATURES = list(FEATURE_EXPRESSIONS)
+
+NUMERIC_FEATURES = BASE_FEATURES + ENGINEERED_FEATURES
+
+# pd.get_dummies orders categories alphabetically, so the one-hot block is fixed
+REGIONS = ['Midwest', 'Northeast', 'South', 'West']
+DIVISIONS = [
+    'East North Central', 'East South Central', 'Middle Atlantic',
+    'Mountain', 'New England', 'Pacific',
+    'South Atlantic', 'West North Central', 'West South Central',
+]
+CATEGORIES = {'Region': REGIONS, 'Division': DIVISIONS}
+
+# Indicator features: name -> (categorical column, category)
+INDICATOR_FEATURES = {
+    f'{column}_{value}': (column, value)
+    for column, values in CATEGORIES.items() for value in values
+}
+DUMMY_FEATURES = list(INDICATOR_FEATURES)
+
+# The 39-column layout best_xgboost_model.pkl and scaler.pkl were fitted on
+FEATURE_COLUMNS = NUMERIC_FEATURES + DUMMY_FEATURES
+
+# Raw columns needed to rebuild FEATURE_COLUMNS from a main-dataset style table
+INPUT_COLUMNS = BASE_FEATURES + list(CATEGORIES)
+
+# Native layout for XGBoost's categorical support: the numeric block, then
+# Region and Division as category codes (position in CATEGORIES, NaN when
+# missing or unknown) instead of 13 indicator columns
+CATEGORICAL_FEATURES = list(CATEGORIES)
+NATIVE_FEATURE_COLUMNS = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+NATIVE_FEATURE_TYPES = ['q'] * len(NUMERIC_FEATURES) + ['c'] * len(CATEGORICAL_FEATURES)
+
+_FUNCTIONS = {'log': np.log, 'log1p': np.log1p, 'exp': np.exp, 'sqrt': np.sqrt}
+
+
+def _expression_inputs(expression):
+    # Base columns an expression reads
+    tree = ast.parse(expression, mode='eval')
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    return sorted(COLUMN_ALIASES[n] for n in names - set(_FUNCTIONS))
+
+
+_GLOBALS = {'__builtins__': {}, **_FUNCTIONS}
+
+_COMPILED = {name: compile(expr, name, 'eval')
+             for name, expr in {**FALLBACK_EXPRESSIONS, **FEATURE_EXPRESSIONS}.items()}
+
+# Base columns each feature depends on (a base column depends on itself)
+FEATURE_INPUTS = {name: [name] for name in BASE_FEATURES}
+FEATURE_INPUTS.update({name: _expression_inputs(expr) for name, expr in FEATURE_EXPRESSIONS.items()})
+FEATURE_INPUTS.update({name: [column] for name, (column, _) in INDICATOR_FEATURES.items()})
+FEATURE_INPUTS.update({name: [name] for name in CATEGORICAL_FEATURES})
+
+
+def conflicting_inputs(columns):
+    # Changed columns that are also derived from other changed columns (e.g.
+    # density together with population); a what-if can't set both consistently
+    columns = set(columns)
+    return sorted(c for c, expression in FALLBACK_EXPRESSIONS.items()
+                  if c in columns and columns.intersection(_expression_inputs(expression)))
+
+
+def features_depending_on(columns, features=FEATURE_COLUMNS):
+    # Features that must be recomputed when any of the given input columns change
+    columns = set(columns)
+    for column, expression in FALLBACK_EXPRESSIONS.items():
+        if columns.intersection(_expression_inputs(expression)):
+            columns.add(column)
+    return [f for f in features if columns.intersection(FEATURE_INPUTS[f])]
+
+
+def used_features(booster, feature_names=FEATURE_COLUMNS):
+    # Features a trained booster actually splits on, in layout order
+    scores = booster.get_score(importance_type='weight')
+    if booster.feature_names is None:
+        used = {feature_names[int(key[1:])] for key in scores}
+    else:
+        used = set(scores)
+    return [f for f in feature_names if f in used]
+
+
+def _evaluate(name, env):
+    if numexpr is not None:
+        expression = FALLBACK_EXPRESSIONS.get(name) or FEATURE_EXPRESSIONS[name]
+        return numexpr.evaluate(expression, local_dict=env)
+    return eval(_COMPILED[name], _GLOBALS, env)
+
+
+def _column(df, name, n):
+    if name in df.columns:
+        return df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.full(n, np.nan)
+
+
+_ALIAS_OF = {column: alias for alias, column in COLUMN_ALIASES.items()}
+
+
+def _alias(column):
+    return _ALIAS_OF[column]
+
+
+def _base_environment(df, needed):
+    # float64 arrays for the base columns under their expression aliases
+    n = len(df)
+    needed = set(needed)
+    for column, expression in reversed(FALLBACK_EXPRESSIONS.items()):
+        # A missing column's fallback may read another missing column
+        if column in needed and column not in df.columns:
+            needed.update(_expression_inputs(expression))
+    env = {}
+    for alias, column in COLUMN_ALIASES.items():
+        if column in needed and column in df.columns:
+            env[alias] = _column(df, column, n)
+
+    for column, expression in FALLBACK_EXPRESSIONS.items():
+        if column in needed and column not in df.columns:
+            for dependency in _expression_inputs(expression):
+                alias = _alias(dependency)
+                if alias not in env:
+                    env[alias] = _column(df, dependency, n)
+            env[_alias(column)] = _evaluate(column, env)
+
+    for column in needed:
+        alias = _alias(column)
+        if alias not in env:
+            env[alias] = np.full(n, np.nan)
+    return env
+
+
+def evaluate_features(df, features=ENGINEERED_FEATURES):
+    # float64 values for the requested numeric features, keyed by name
+    needed = sorted({c for f in features for c in FEATURE_INPUTS[f]})
+    env = _base_environment(df, needed)
+    values = {}
+    for name in features:
+        if name in FEATURE_EXPRESSIONS:
+            values[name] = _evaluate(name, env)
+        else:
+            values[name] = env[_alias(name)]
+    return values
+
+
+def evaluate_row(inputs, features=ENGINEERED_FEATURES):
+    # Scalar version of evaluate_features for one county: inputs maps base
+    # column -> float. Avoids numexpr/DataFrame overhead on single rows.
+    # np.float64 keeps NumPy semantics (x / 0 -> inf) instead of raising.
+    env = {_alias(column): np.float64(value) for column, value in inputs.items()}
+    for column in FALLBACK_EXPRESSIONS:
+        if _alias(column) not in env:
+            env[_alias(column)] = eval(_COMPILED[column], _GLOBALS, env)
+    values = {}
+    for name in features:
+        if name in FEATURE_EXPRESSIONS:
+            values[name] = eval(_COMPILED[name], _GLOBALS, env)
+        else:
+            values[name] = env[_alias(name)]
+    return values
+
+
+def category_codes(df, column):
+    # float64 codes of a categorical column in CATEGORIES order; NaN when
+    # missing or not a known category, so the layout never depends on which
+    # categories a table happens to contain
+    codes = pd.Categorical(df[column], categories=CATEGORIES[column]).codes.astype(np.float64)
+    codes[codes < 0] = np.nan
+    return codes
+
+
+# Advanced Feature Engineering
+def create_features(df):
+    # DataFrame API used by the training script: appends ENGINEERED_FEATURES in one concat
+    derived = pd.DataFrame(evaluate_features(df), index=df.index)
+    return pd.concat([df, derived], axis=1)
+
+
+def encode_features(df):
+    # Same as pd.get_dummies(df, columns=['Region', 'Division']) but always emits
+    # all 13 indicator columns, so a subset of counties keeps the training layout
+    encoded = df.drop(columns=list(CATEGORIES))
+    indicators = {name: df[column] == value for name, (column, value) in INDICATOR_FEATURES.items()}
+    return pd.concat([encoded, pd.DataFrame(indicators, index=df.index)], axis=1)
+
+
+def build_feature_matrix(df, out=None, center=None, scale=None, features=FEATURE_COLUMNS):
+    # Vectorized equivalent of create_features + encode_features: evaluates the
+    # registry straight into a float32 (n, len(features)) buffer with no
+    # DataFrame inserts. features may be a subset (see used_features) or the
+    # NATIVE_FEATURE_COLUMNS layout, whose Region/Division are category codes.
+    # If center/scale are given (RobustScaler.center_/scale_, in FEATURE_COLUMNS
+    # order) each numeric column is scaled in float64 before the cast, matching
+    # scaler.transform exactly; scaling after the cast moves values like
+    # pop_density_squared across split thresholds.
+    n = len(df)
+    if out is None:
+        out = np.empty((n, len(features)), dtype=np.float32)
+    else:
+        out = out[:n, :len(features)]
+
+    numeric = [f for f in features if f not in INDICATOR_FEATURES and f not in CATEGORIES]
+    values = evaluate_features(df, numeric)
+
+    codes = {}
+    for column, categories in CATEGORIES.items():
+        if any(INDICATOR_FEATURES.get(f, (None,))[0] == column for f in features):
+            codes[column] = pd.Categorical(df[column], categories=categories).codes
+
+    for j, name in enumerate(features):
+        if name in CATEGORIES:
+            out[:, j] = category_codes(df, name)
+            continue
+        if name in INDICATOR_FEATURES:
+            column, value = INDICATOR_FEATURES[name]
+            values[name] = (codes[column] == CATEGORIES[column].index(value)).astype(np.float64)
+        column = values[name]
+        if center is not None:
+            k = FEATURE_COLUMNS.index(name)
+            column = (column - center[k]) / scale[k]
+        out[:, j] = column
+
+    return out
@@ -0,0 +1,88 @@
+import hashlib
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import KFold
+
+MAX_BIN = 256
+
+# Live caches keyed by data_key(), shared by every stage of a training run
+_CACHES = {}
+
+
+def data_key(X, y, n_splits=5, shuffle=False, seed=42, max_bin=MAX_BIN, feature_types=None):
+    # Content hash of the training arrays plus everything that shapes the folds
+    X = np.ascontiguousarray(X)
+    y = np.ascontiguousarray(y)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((X.shape, X.dtype.str, y.shape, y.dtype.str, n_splits, shuffle, seed, max_bin,
+                   feature_types)).encode())
+    h.update(X.view(np.uint8).ravel())
+    h.update(y.view(np.uint8).ravel())
+    return h.hexdigest()
+
+
+class FoldCache:
+    # Quantized training data for one (X, y, fold layout): the full-train
+    # QuantileDMatrix plus a train/validation pair per fold, each built once.
+    # feature_types ('q'/'c' per column) marks category-code columns for
+    # XGBoost's native categorical splits. fold_matrices(train_idx, valid_idx)
+    # -> (X_train, X_valid), if given, builds each fold's matrices instead of
+    # taking rows of X (for columns recomputed out-of-fold from the labels).
+    def __init__(self, X, y, n_splits=5, shuffle=False, seed=42, max_bin=MAX_BIN, key=None, feature_types=None,
+                 fold_matrices=None):
+        self.X = np.asarray(X)
+        self.y = np.asarray(y)
+        self.n_splits = n_splits
+        self.max_bin = max_bin
+        self.feature_types = feature_types
+        self.fold_matrices = fold_matrices
+        self.key = key or data_key(self.X, self.y, n_splits, shuffle, seed, max_bin, feature_types)
+
+        kfold = KFold(n_splits=n_splits, shuffle=shuffle, random_state=seed if shuffle else None)
+        self.splits = list(kfold.split(self.X))
+
+        self._full = None
+        self._folds = None
+
+    def full(self):
+        if self._full is None:
+            self._full = self._matrix(self.X, self.y, max_bin=self.max_bin)
+        return self._full
+
+    def _matrix(self, X, y, **kwargs):
+        if self.feature_types is None:
+            return xgb.QuantileDMatrix(X, label=y, **kwargs)
+        return xgb.QuantileDMatrix(X, label=y, feature_types=self.feature_types, enable_categorical=True, **kwargs)
+
+    @property
+    def folds(self):
+        # [(dtrain, dvalid, y_valid), ...]; dvalid shares dtrain's quantile cuts
+        if self._folds is None:
+            self._folds = []
+            for train_idx, valid_idx in self.splits:
+                if self.fold_matrices is None:
+                    X_fit, X_valid = self.X[train_idx], self.X[valid_idx]
+                else:
+                    X_fit, X_valid = self.fold_matrices(train_idx, valid_idx)
+                dtrain = self._matrix(X_fit, self.y[train_idx], max_bin=self.max_bin)
+                dvalid = self._matrix(X_valid, self.y[valid_idx], ref=dtrain)
+                self._folds.append((dtrain, dvalid, self.y[valid_idx]))
+        return self._folds
+
+
+def get_fold_cache(X, y, n_splits=5, shuffle=False, seed=42, max_bin=MAX_BIN, feature_types=None,
+                   fold_matrices=None):
+    key = data_key(X, y, n_splits, shuffle, seed, max_bin, feature_types)
+    if fold_matrices is not None:
+        # A per-fold builder isn't part of the content hash: never shared
+        return FoldCache(X, y, n_splits=n_splits, shuffle=shuffle, seed=seed, max_bin=max_bin,
+                         key=key, feature_types=feature_types, fold_matrices=fold_matrices)
+    if key not in _CACHES:
+        _CACHES[key] = FoldCache(X, y, n_splits=n_splits, shuffle=shuffle, seed=seed,
+                                 max_bin=max_bin, key=key, feature_types=feature_types)
+    return _CACHES[key]
+
+
+def clear_fold_caches():
+    _CACHES.clear()
@@ -0,0 +1,317 @@
+import math
+import time
+
+import numpy as np
+import xgboost as xgb
+from xgboost import XGBRegressor
+
+from fold_cache import get_fold_cache
+from profiling import profiler
+
+# Upper bound on boosting rounds; early stopping picks the actual n_estimators
+MAX_ROUNDS = 300
+EARLY_STOPPING_ROUNDS = 20
+
+# The GridSearchCV grid the training script tuned over before the budgeted
+# search: the baseline for its time-saved estimate and for benchmarks.py
+REDUCED_PARAM_GRID = {
+    'max_depth': [3, 5, 7],
+    'learning_rate': [0.05, 0.1],
+    'n_estimators': [200, 300],
+    'min_child_weight': [3, 5],
+    'subsample': [0.8],
+    'colsample_bytree': [0.8],
+    'gamma': [0, 0.1],
+    'reg_alpha': [0.5, 1],
+    'reg_lambda': [1, 2]
+}
+
+# sklearn-style XGBRegressor names -> native xgb.train parameter names
+_NATIVE_NAMES = {
+    'learning_rate': 'eta',
+    'reg_alpha': 'alpha',
+    'reg_lambda': 'lambda',
+}
+
+
+class Budget:
+    # Stops a search after max_fits single-fold fits or max_seconds of wall time
+    def __init__(self, max_fits=None, max_seconds=None):
+        self.max_fits = max_fits
+        self.max_seconds = max_seconds
+        self.fits = 0
+        self.start = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def exhausted(self, n_folds=0):
+        if self.max_fits is not None and self.fits + n_folds > self.max_fits:
+            return True
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return True
+        return False
+
+
+class SearchResult:
+    def __init__(self, method, best_params, best_score, best_fold_scores, trials, n_fits, elapsed, fit_seconds_per_round):
+        self.method = method
+        self.best_params = best_params
+        self.best_score = best_score
+        self.best_fold_scores = best_fold_scores
+        self.trials = trials
+        self.n_fits = n_fits
+        self.elapsed = elapsed
+        self.fit_seconds_per_round = fit_seconds_per_round
+
+    def estimated_grid_seconds(self, grid, n_folds):
+        # What an exhaustive GridSearchCV over grid would cost at the measured fit speed
+        rounds = grid.get('n_estimators', [MAX_ROUNDS])
+        n_other = math.prod(len(v) for k, v in grid.items() if k != 'n_estimators')
+        return n_other * n_folds * sum(rounds) * self.fit_seconds_per_round
+
+
+def native_params(params, seed=42, n_jobs=-1):
+    # XGBRegressor-style params -> xgb.train params (n_estimators is the round count)
+    native = {'objective': 'reg:squarederror', 'tree_method': 'hist', 'seed': seed, 'nthread': n_jobs}
+    for name, value in params.items():
+        if name != 'n_estimators':
+            native[_NATIVE_NAMES.get(name, name)] = value
+    return native
+
+
+def _r2(y_true, y_pred):
+    ss_res = np.sum((y_true - y_pred) ** 2)
+    ss_tot = np.sum((y_true - y_true.mean()) ** 2)
+    return 1 - ss_res / ss_tot
+
+
+def fit_regressor(params, dtrain, seed=42, n_jobs=-1):
+    # Train on a prebuilt (Quantile)DMatrix and hand back an XGBRegressor, so the
+    # final fit reuses the cached quantization instead of re-binning X
+    native = native_params(params, seed, n_jobs)
+    booster = xgb.train(native, dtrain, num_boost_round=params.get('n_estimators', 100))
+    categorical = 'c' in (dtrain.feature_types or [])
+    model = XGBRegressor(random_state=seed, n_jobs=n_jobs, enable_categorical=categorical, **params)
+    model.load_model(bytearray(booster.save_raw('ubj')))
+    return model
+
+
+class _Evaluator:
+    # Cross-validates one parameter set on the cached folds with early
+    # stopping. A fold's early stopping watches its own validation set, so
+    # scoring it at its own best iteration would leak; each fold is instead
+    # scored at the mean best round count of the other folds.
+    def __init__(self, folds, budget, seed=42, n_jobs=-1, early_stopping_rounds=EARLY_STOPPING_ROUNDS):
+        self.folds = folds
+        self.budget = budget
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.early_stopping_rounds = early_stopping_rounds
+        self.trials = []
+        self.fit_seconds = 0.0
+        self.rounds_trained = 0
+
+    def __call__(self, params, num_rounds):
+        with profiler.stage('candidate', cat='search', params=dict(params), num_rounds=num_rounds) as trace:
+            native = dict(native_params(params, self.seed, self.n_jobs), eval_metric='rmse')
+            boosters = []
+            best_iterations = []
+            fit_seconds = 0.0
+            for fold, (dtrain, dvalid, y_valid) in enumerate(self.folds):
+                start = time.perf_counter()
+                booster = xgb.train(native, dtrain, num_boost_round=num_rounds,
+                                    evals=[(dvalid, 'valid')],
+                                    early_stopping_rounds=self.early_stopping_rounds,
+                                    verbose_eval=False)
+                seconds = time.perf_counter() - start
+                fit_seconds += seconds
+                self.rounds_trained += booster.num_boosted_rounds()
+                self.budget.fits += 1
+                profiler.record('fold fit', start, seconds, fold=fold, rounds=booster.num_boosted_rounds())
+                boosters.append(booster)
+                best_iterations.append(booster.best_iteration + 1)
+
+            fold_scores = []
+            for fold, (booster, (dtrain, dvalid, y_valid)) in enumerate(zip(boosters, self.folds)):
+                others = best_iterations[:fold] + best_iterations[fold + 1:]
+                rounds = int(round(np.mean(others))) if others else best_iterations[fold]
+                if rounds > booster.num_boosted_rounds():
+                    # Stopped early on this fold: keep boosting up to the chosen count
+                    start = time.perf_counter()
+                    extra = rounds - booster.num_boosted_rounds()
+                    booster = xgb.train(native, dtrain, num_boost_round=extra, xgb_model=booster)
+                    fit_seconds += time.perf_counter() - start
+                    self.rounds_trained += extra
+                y_pred = booster.predict(dvalid, iteration_range=(0, rounds))
+                fold_scores.append(_r2(y_valid, y_pred))
+            self.fit_seconds += fit_seconds
+            trace['mean_score'] = float(np.mean(fold_scores))
+
+        trial = {
+            'params': dict(params),
+            'num_rounds': num_rounds,
+            'n_estimators': int(round(np.mean(best_iterations))),
+            'mean_score': float(np.mean(fold_scores)),
+            'fold_scores': [float(s) for s in fold_scores],
+            'fit_seconds': fit_seconds,
+        }
+        self.trials.append(trial)
+        return trial['mean_score']
+
+
+def _sample(space, rng):
+    return {name: values[rng.integers(len(values))] for name, values in space.items()}
+
+
+def _search_space(space):
+    # n_estimators becomes the early-stopping ceiling rather than a searched value
+    return {k: list(v) for k, v in space.items() if k != 'n_estimators'}
+
+
+def random_search(space, evaluate, budget, max_rounds, rng):
+    n_folds = len(evaluate.folds)
+    seen = set()
+    n_total = math.prod(len(v) for v in space.values())
+    while not budget.exhausted(n_folds) and len(seen) < n_total:
+        params = _sample(space, rng)
+        key = tuple(sorted(params.items()))
+        if key in seen:
+            continue
+        seen.add(key)
+        evaluate(params, max_rounds)
+
+
+def successive_halving(space, evaluate, budget, max_rounds, rng, n_candidates=None, eta=3, min_rounds=None):
+    # Boosting rounds are the resource: many candidates get a few rounds,
+    # the best 1/eta are promoted to eta times more rounds
+    n_folds = len(evaluate.folds)
+    if min_rounds is None:
+        min_rounds = max(10, max_rounds // eta ** 3)
+    n_rungs = max(1, int(math.log(max_rounds / min_rounds, eta)) + 1)
+    if n_candidates is None:
+        n_candidates = eta ** (n_rungs - 1)
+
+    candidates = [_sample(space, rng) for _ in range(n_candidates)]
+    for rung in range(n_rungs):
+        rounds = max_rounds if rung == n_rungs - 1 else min(max_rounds, int(min_rounds * eta ** rung))
+        scored = []
+        for params in candidates:
+            if budget.exhausted(n_folds):
+                break
+            scored.append((evaluate(params, rounds), params))
+        if not scored:
+            return
+        scored.sort(key=lambda item: item[0], reverse=True)
+        candidates = [params for _, params in scored[:max(1, len(scored) // eta)]]
+        if len(scored) == 1:
+            return
+
+
+def hyperband(space, evaluate, budget, max_rounds, rng, eta=3):
+    # Successive halving brackets trading candidate count against starting rounds
+    min_rounds = max(10, max_rounds // eta ** 3)
+    s_max = max(0, int(math.log(max_rounds / min_rounds, eta)))
+    for s in range(s_max, -1, -1):
+        if budget.exhausted(len(evaluate.folds)):
+            return
+        n_candidates = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        successive_halving(space, evaluate, budget, max_rounds, rng,
+                           n_candidates=n_candidates, eta=eta,
+                           min_rounds=max(min_rounds, max_rounds // eta ** s))
+
+
+def bayesian_search(space, evaluate, budget, max_rounds, rng, n_initial=8, n_pool=512):
+    # Gaussian-process surrogate over the grid indices with expected improvement
+    from scipy.stats import norm
+    from sklearn.gaussian_process import GaussianProcessRegressor
+    from sklearn.gaussian_process.kernels import Matern, WhiteKernel
+
+    names = list(space)
+    sizes = np.array([len(space[n]) for n in names])
+    n_folds = len(evaluate.folds)
+
+    def to_params(idx):
+        return {n: space[n][i] for n, i in zip(names, idx)}
+
+    def encode(idx):
+        return np.asarray(idx) / np.maximum(sizes - 1, 1)
+
+    observed_idx = []
+    observed_scores = []
+    seen = set()
+    while not budget.exhausted(n_folds):
+        if len(observed_idx) < n_initial:
+            idx = tuple(int(rng.integers(s)) for s in sizes)
+        else:
+            gp = GaussianProcessRegressor(kernel=Matern(nu=2.5) + WhiteKernel(), normalize_y=True,
+                                          random_state=int(rng.integers(2 ** 31)))
+            gp.fit(encode(observed_idx), np.array(observed_scores))
+            pool = np.column_stack([rng.integers(s, size=n_pool) for s in sizes])
+            mu, sigma = gp.predict(encode(pool), return_std=True)
+            best = max(observed_scores)
+            z = (mu - best) / np.maximum(sigma, 1e-9)
+            expected_improvement = (mu - best) * norm.cdf(z) + sigma * norm.pdf(z)
+            idx = None
+            for i in np.argsort(-expected_improvement):
+                if tuple(pool[i]) not in seen:
+                    idx = tuple(int(v) for v in pool[i])
+                    break
+            if idx is None:
+                return
+        if idx in seen:
+            if len(seen) >= np.prod(sizes):
+                return
+            continue
+        seen.add(idx)
+        observed_idx.append(idx)
+        observed_scores.append(evaluate(to_params(idx), max_rounds))
+
+
+SEARCH_METHODS = {
+    'random': random_search,
+    'successive_halving': successive_halving,
+    'hyperband': hyperband,
+    'bayesian': bayesian_search,
+}
+
+
+def run_search(space, X, y, method='hyperband', max_fits=None, max_seconds=None,
+               folds=None, n_splits=5, max_rounds=MAX_ROUNDS, seed=42, n_jobs=-1):
+    # Budgeted replacement for GridSearchCV(XGBRegressor(), space, cv=n_splits, scoring='r2')
+    if method not in SEARCH_METHODS:
+        raise ValueError(f"Unknown search method '{method}'. Choose from {sorted(SEARCH_METHODS)}")
+    if max_fits is None and max_seconds is None:
+        raise ValueError("Give the search a budget: max_fits and/or max_seconds")
+
+    if folds is None:
+        folds = get_fold_cache(X, y, n_splits=n_splits, seed=seed).folds
+    budget = Budget(max_fits=max_fits, max_seconds=max_seconds)
+    evaluate = _Evaluator(folds, budget, seed=seed, n_jobs=n_jobs)
+    rng = np.random.default_rng(seed)
+
+    SEARCH_METHODS[method](_search_space(space), evaluate, budget, max_rounds, rng)
+    if not evaluate.trials:
+        raise RuntimeError("Search budget too small to evaluate a single candidate")
+
+    # Only candidates trained to the highest round count compete (halving rungs are partial)
+    top_rounds = max(t['num_rounds'] for t in evaluate.trials)
+    full = [t for t in evaluate.trials if t['num_rounds'] == top_rounds]
+    best = max(full, key=lambda t: t['mean_score'])
+    best_params = dict(best['params'], n_estimators=best['n_estimators'])
+
+    return SearchResult(
+        method=method,
+        best_params=best_params,
+        best_score=best['mean_score'],
+        best_fold_scores=np.array(best['fold_scores']),
+        trials=evaluate.trials,
+        n_fits=budget.fits,
+        elapsed=budget.elapsed(),
+        fit_seconds_per_round=evaluate.fit_seconds / max(evaluate.rounds_trained, 1),
+    )
+
+
+def grid_size(grid):
+    return math.prod(len(v) for v in grid.values())
+
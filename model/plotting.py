@@ -0,0 +1,283 @@
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import matplotlib.style
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+# Dark theme shared by every figure (Tailwind colors)
+BACKGROUND = '#030712'  # gray-950
+BAR = '#3b82f6'         # blue-500
+BAR_EDGE = '#60a5fa'    # blue-400
+REFERENCE = '#ef4444'   # red-500
+LABEL = '#9ca3af'       # gray-400
+SPINE = '#374151'       # gray-700
+FIGSIZE = (10, 6)
+DPI = 300
+
+# Default outputs of the command line, where the original scripts wrote them:
+# the race chart and figures/ at the repo root, the importance chart in model/
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RACE_PATH = os.path.join(REPO_ROOT, 'aqi_by_race_dark.png')
+IMPORTANCE_PATH = os.path.join(REPO_ROOT, 'model', 'feature_importance_dark.png')
+
+# PNG text field holding the job key a file was rendered from
+KEY_FIELD = 'Figure-Key'
+
+# Variants are written to <FIGURES_DIR>/<figure>/<Region|Division>_<name>.png
+FIGURES_DIR = 'figures'
+GROUP_COLUMNS = ['Region', 'Division']
+
+RACE_COLUMNS = ['% Hispanic or Latino', '% White alone', '% Black or African American alone',
+                '% American Indian and Alaska Native alone', '% Asian alone', '% Two or More Races']
+# Predominant-race groups shown in the AQI-by-race chart
+RACE_GROUPS = ['Hispanic or Latino', 'Black or African American', 'White']
+
+# Human-readable names for the importance chart
+FEATURE_LABELS = {
+    'black_density': 'Black Population Density',
+    'minority_density': 'Minority Population Density',
+    'income_per_capita': 'Income Per Capita',
+    'Region_West': 'Western Region',
+    'Division_Pacific': 'Pacific Division',
+    'Land_Area_SqMi': 'Land Area',
+    'income_to_density_ratio': 'Income-to-Density Ratio',
+    'white_to_minority_ratio': 'White-to-Minority Ratio',
+    'population_density': 'Population Density',
+    'total_minority_pct': 'Total Minority %',
+}
+
+with open(os.path.abspath(__file__), 'rb') as f:
+    # Any change to this module (theme, layout) re-renders every figure
+    _MODULE_KEY = joblib.hash(f.read())
+
+
+# ---------------------------------------------------------------------------
+# Figures: each takes plain data and returns a styled matplotlib Figure.
+# They use the object API (no pyplot), so nothing depends on a GUI backend.
+
+def _figure():
+    fig = Figure(figsize=FIGSIZE, facecolor=BACKGROUND)
+    ax = fig.add_subplot(111)
+    ax.set_facecolor(BACKGROUND)
+    return fig, ax
+
+
+def _style(ax, xlabel, ylabel, title, grid_axis='both'):
+    ax.set_xlabel(xlabel, color=LABEL, fontsize=12)
+    if ylabel:
+        ax.set_ylabel(ylabel, color=LABEL, fontsize=12)
+    ax.set_title(title, color='white', fontsize=14, pad=20)
+    ax.grid(True, axis=grid_axis, alpha=0.1, linestyle=':')
+    for spine in ax.spines.values():
+        spine.set_color(SPINE)
+
+
+def r2(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype=np.float64)
+    residual = ((y_true - np.asarray(y_pred, dtype=np.float64)) ** 2).sum()
+    return 1 - residual / ((y_true - y_true.mean()) ** 2).sum()
+
+
+def predictions_figure(y_true, y_pred, title):
+    fig, ax = _figure()
+    ax.scatter(y_true, y_pred, alpha=0.5, color=BAR, s=50)
+    ax.plot([y_true.min(), y_true.max()], [y_true.min(), y_true.max()], color=REFERENCE, linestyle='--', lw=2)
+    _style(ax, 'Actual AQI', 'Predicted AQI', title)
+    return fig
+
+
+def aqi_by_race(df):
+    # Mean median AQI of counties by predominant race (over all race columns),
+    # restricted to RACE_GROUPS
+    df = df.dropna(subset=RACE_COLUMNS + ['median_aqi'])
+    predominant = df[RACE_COLUMNS].idxmax(axis=1).str.replace('% ', '').str.replace(' alone', '')
+    df = df[predominant.isin(RACE_GROUPS)]
+    return df.groupby(predominant[df.index])['median_aqi'].mean().sort_values(ascending=False)
+
+
+def race_figure(means, title):
+    fig, ax = _figure()
+    # A raised y-axis floor makes the differences easier to see; values are unchanged
+    ax.set_ylim(means.min() * 0.9, means.max() * 1.05)
+    bars = ax.bar(means.index, means.values, color=BAR, alpha=0.8, width=0.6, edgecolor=BAR_EDGE, linewidth=1)
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2., height + 0.5, f'{height:.1f}',
+                ha='center', va='bottom', color='white', fontweight='bold')
+    _style(ax, 'Predominant Race in County', 'Average Median AQI', title, grid_axis='y')
+    return fig
+
+
+def importance_figure(importance, title, n_top=5):
+    # Horizontal bars of the n_top features (highest at top), sample_weight excluded
+    top = importance.drop('sample_weight', errors='ignore').sort_values(ascending=False).head(n_top)[::-1]
+    fig, ax = _figure()
+    bars = ax.barh([FEATURE_LABELS.get(name, name) for name in top.index], top.to_numpy(),
+                   color=BAR, alpha=0.8, edgecolor=BAR_EDGE, linewidth=1)
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width + 0.02, bar.get_y() + bar.get_height() / 2., f'{width:.2f}',
+                ha='left', va='center', color='white', fontweight='bold')
+    _style(ax, 'Mean |SHAP| (AQI points)', None, title, grid_axis='x')
+    return fig
+
+
+# ---------------------------------------------------------------------------
+# Jobs: a figure function, its inputs and an output path. The key hashes the
+# inputs (data and model outputs) together with this module's source.
+
+class FigureJob:
+    def __init__(self, path, func, *args, **kwargs):
+        self.path = path
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = joblib.hash((_MODULE_KEY, func.__name__, args, kwargs))
+
+    def is_current(self):
+        # Rendered before from identical inputs (the key is stored in the PNG)
+        if not os.path.exists(self.path):
+            return False
+        from PIL import Image
+        with Image.open(self.path) as image:
+            return image.text.get(KEY_FIELD) == self.key
+
+    def render(self):
+        with matplotlib.style.context('dark_background'):
+            fig = self.func(*self.args, **self.kwargs)
+            fig.tight_layout()
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fig.savefig(self.path, dpi=DPI, facecolor=fig.get_facecolor(), edgecolor='none',
+                        metadata={KEY_FIELD: self.key})
+        return self.path
+
+
+def _noop():
+    return None
+
+
+def _render(job):
+    return job.render()
+
+
+def _slug(value):
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(value)).strip('_')
+
+
+def variant_path(figure, column, value, out_dir=FIGURES_DIR):
+    return os.path.join(out_dir, figure, f'{column}_{_slug(value)}.png')
+
+
+def prediction_jobs(y_true, y_pred, groups=None, path='predictions_vs_actual.png', out_dir=FIGURES_DIR):
+    # The overall predictions-vs-actual chart plus one per value of each
+    # groups column ({'Region': labels, 'Division': labels}, aligned with y)
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    jobs = [FigureJob(path, predictions_figure, y_true, y_pred,
+                      f'Predictions vs Actual (R² = {r2(y_true, y_pred):.4f})')]
+    for column, labels in (groups or {}).items():
+        labels = np.asarray(labels)
+        for value in sorted(set(labels)):
+            mask = labels == value
+            if mask.sum() < 2:
+                continue
+            jobs.append(FigureJob(variant_path('predictions_vs_actual', column, value, out_dir), predictions_figure,
+                                  y_true[mask], y_pred[mask],
+                                  f'Predictions vs Actual: {value} (R² = {r2(y_true[mask], y_pred[mask]):.4f}, n={mask.sum()})'))
+    return jobs
+
+
+def race_jobs(df, path='aqi_by_race_dark.png', out_dir=FIGURES_DIR, group_columns=GROUP_COLUMNS):
+    # AQI by predominant race overall and within each Region/Division that has
+    # at least one of the RACE_GROUPS
+    jobs = [FigureJob(path, race_figure, aqi_by_race(df), 'Average Median AQI by Predominant Race')]
+    for column in group_columns:
+        for value, group in df.groupby(column, observed=True):
+            means = aqi_by_race(group)
+            if len(means):
+                jobs.append(FigureJob(variant_path('aqi_by_race', column, value, out_dir), race_figure,
+                                      means, f'Average Median AQI by Predominant Race: {value}'))
+    return jobs
+
+
+def importance_job(importance, path='feature_importance_dark.png'):
+    return FigureJob(path, importance_figure, pd.Series(importance), 'Top 5 Predictive Features for AQI')
+
+
+class FigureRenderer:
+    # Background process pool rendering FigureJobs with the Agg canvas, so
+    # 300-dpi PNGs don't hold up the caller. Jobs whose PNG already carries
+    # their key are skipped. Like TrainScheduler, create it before any
+    # XGBoost (OpenMP) work: where the default start method is fork, workers
+    # are forked right away.
+    def __init__(self, n_workers=2):
+        self.pool = ProcessPoolExecutor(max_workers=n_workers)
+        self.pool.submit(_noop).result()
+        self.pending = []
+        self.skipped = []
+
+    def submit(self, jobs):
+        for job in jobs:
+            if job.is_current():
+                self.skipped.append(job.path)
+            else:
+                self.pending.append(self.pool.submit(_render, job))
+        return self
+
+    def wait(self):
+        # (rendered paths, skipped paths) since the last wait
+        rendered = [future.result() for future in self.pending]
+        skipped = self.skipped
+        self.pending, self.skipped = [], []
+        return rendered, skipped
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+def render_all(jobs, n_workers=None):
+    # Render (or skip) jobs in a fresh pool and report what was written; no
+    # pool is started when every figure is already current
+    stale = [job for job in jobs if not job.is_current()]
+    skipped = [job.path for job in jobs if job not in stale]
+    rendered = []
+    if stale:
+        renderer = FigureRenderer(n_workers or min(len(stale), os.cpu_count() or 1))
+        try:
+            rendered = renderer.submit(stale).wait()[0]
+        finally:
+            renderer.shutdown()
+    for path in rendered:
+        print(f"Saved plot to '{path}'")
+    if skipped:
+        print(f"{len(skipped)} plot(s) unchanged, skipped")
+    return rendered, skipped
+
+
+if __name__ == "__main__":
+    from storage import load_table
+
+    parser = argparse.ArgumentParser(description="Render the dark-theme figures (skipping unchanged ones)")
+    parser.add_argument('figures', nargs='*', metavar='{race,importance}', help="default: both")
+    parser.add_argument('--no-variants', action='store_true', help="skip the per-Region/Division variants")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out-dir', default=os.path.join(REPO_ROOT, FIGURES_DIR), help="directory for the variants")
+    args = parser.parse_args()
+    figures = args.figures or ['race', 'importance']
+    # Checked here: argparse rejects an empty nargs='*' list against choices
+    if set(figures) - {'race', 'importance'}:
+        parser.error(f"unknown figure(s) {sorted(set(figures) - {'race', 'importance'})}")
+
+    jobs = []
+    if 'race' in figures:
+        df = load_table('main', columns=RACE_COLUMNS + ['median_aqi'] + GROUP_COLUMNS)
+        jobs += race_jobs(df, RACE_PATH, args.out_dir, group_columns=[] if args.no_variants else GROUP_COLUMNS)
+    if 'importance' in figures:
+        from attribution import Attributions
+        jobs.append(importance_job(Attributions().global_importance(), IMPORTANCE_PATH))
+    render_all(jobs, args.workers)
@@ -0,0 +1,150 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Set to a trace path (or 1 for TRACE_PATH) to profile any script using `profiler`
+ENV_VAR = 'AQI_PROFILE'
+TRACE_PATH = 'training-trace.json'
+
+
+def peak_rss_mb():
+    # Peak resident set size since the last reset_peak_rss (Linux VmHWM), else since start
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 1024
+
+
+def reset_peak_rss():
+    # Writing 5 to clear_refs resets VmHWM so each stage gets its own peak.
+    # False where it can't be reset (no /proc, e.g. macOS): peaks read after
+    # it are then cumulative since process start.
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class Profiler:
+    # Nested wall/CPU/peak-memory timings recorded as Chrome trace events
+    # (chrome://tracing, Perfetto). Disabled, stage() and record() cost one
+    # attribute check, so instrumented code can stay instrumented.
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.events = []
+        self._origin = time.perf_counter()
+        self._stack = []  # running peak RSS of each open stage
+        self.cumulative_rss = False  # set once a peak RSS reset fails
+
+    def enable(self, path=TRACE_PATH):
+        self.enabled = True
+        self.path = path
+        self.events = []
+        self._origin = time.perf_counter()
+        return self
+
+    def _ts(self, t):
+        return (t - self._origin) * 1e6
+
+    @contextmanager
+    def stage(self, name, cat='stage', **args):
+        # Times the block; the yielded dict can be filled with extra trace args
+        if not self.enabled:
+            yield args
+            return
+        # Peak RSS per stage: VmHWM is reset on entry, so the peak seen so far
+        # is first credited to every enclosing stage
+        current = peak_rss_mb()
+        self._stack = [max(peak, current) for peak in self._stack]
+        if not reset_peak_rss():
+            self.cumulative_rss = True
+        self._stack.append(0.0)
+        depth = len(self._stack) - 1
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield args
+        finally:
+            end, cpu_end = time.perf_counter(), time.process_time()
+            peak = max(self._stack.pop(), peak_rss_mb())
+            self._stack = [max(p, peak) for p in self._stack]
+            self.events.append({
+                'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                'ts': self._ts(start), 'dur': (end - start) * 1e6,
+                'args': dict(args, cpu_ms=round((cpu_end - cpu_start) * 1000, 3),
+                             peak_rss_mb=round(peak, 1), depth=depth),
+            })
+
+    def record(self, name, start, seconds, cat='fit', **args):
+        # An interval timed by the caller (start from time.perf_counter())
+        if not self.enabled:
+            return
+        self.events.append({
+            'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+            'ts': self._ts(start), 'dur': seconds * 1e6, 'args': dict(args, depth=len(self._stack)),
+        })
+
+    def summary(self):
+        # One row per event name, in order of first start: count, wall/CPU
+        # totals, mean/max wall and peak RSS
+        rows = {}
+        for event in sorted(self.events, key=lambda e: e['ts']):
+            row = rows.setdefault(event['name'], {
+                'depth': event['args']['depth'], 'count': 0, 'wall_s': 0.0,
+                'max_s': 0.0, 'cpu_s': None, 'peak_rss_mb': None,
+            })
+            seconds = event['dur'] / 1e6
+            row['count'] += 1
+            row['wall_s'] += seconds
+            row['max_s'] = max(row['max_s'], seconds)
+            if 'cpu_ms' in event['args']:
+                row['cpu_s'] = (row['cpu_s'] or 0.0) + event['args']['cpu_ms'] / 1000
+            if 'peak_rss_mb' in event['args']:
+                row['peak_rss_mb'] = max(row['peak_rss_mb'] or 0.0, event['args']['peak_rss_mb'])
+        return rows
+
+    def print_summary(self):
+        rows = self.summary()
+        print(f"\n{'stage':32s} {'n':>5s} {'wall s':>9s} {'cpu s':>9s} {'mean s':>9s} {'max s':>9s} {'peak MB':>9s}")
+        for name, row in rows.items():
+            label = '  ' * row['depth'] + name
+            # Caller-timed events (record) have no CPU time or peak memory
+            cpu = f"{row['cpu_s']:9.3f}" if row['cpu_s'] is not None else f"{'':>9s}"
+            peak = f"{row['peak_rss_mb']:9.1f}" if row['peak_rss_mb'] is not None else f"{'':>9s}"
+            print(f"{label:32s} {row['count']:5d} {row['wall_s']:9.3f} {cpu} "
+                  f"{row['wall_s'] / row['count']:9.4f} {row['max_s']:9.4f} {peak}")
+        if self.cumulative_rss:
+            print("peak MB is cumulative since process start (peak RSS can't be reset on this platform)")
+
+    def write(self, path=None):
+        path = path or self.path
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def finish(self):
+        # Print the summary table and write the trace, if enabled
+        if not self.enabled:
+            return None
+        self.print_summary()
+        path = self.write()
+        print(f"Saved trace ({len(self.events)} events) to '{path}'; open it in chrome://tracing or ui.perfetto.dev")
+        return path
+
+
+# Shared instance; enabled from the environment at import
+profiler = Profiler()
+if os.environ.get(ENV_VAR, '') not in ('', '0'):
+    profiler.enable(TRACE_PATH if os.environ[ENV_VAR] == '1' else os.environ[ENV_VAR])
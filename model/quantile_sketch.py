@@ -0,0 +1,109 @@
+import numpy as np
+
+# Items kept by the top compactor; rank error is roughly 1.7 / K (~0.1%), and a
+# column with fewer than K non-missing values is summarized exactly
+K = 2048
+
+
+class QuantileSketch:
+    # KLL-style mergeable quantile sketch for one column. Level h holds items
+    # of weight 2**h; a full level is sorted and every other item (random
+    # offset) is promoted, so memory stays O(K) however many values stream in.
+    # Sketches built on separate chunks or processes combine with merge().
+    def __init__(self, k=K, seed=0):
+        self.k = k
+        self.n = 0
+        self.n_missing = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h):
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.levels) - 1 - h))))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._capacity(h):
+                level = np.sort(level)
+                # Compact an even number of items; an odd one stays at this level
+                keep = level[len(level) - len(level) % 2:]
+                promoted = level[self._rng.integers(2):len(level) - len(level) % 2:2]
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                h = 0
+            else:
+                h += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        missing = np.isnan(values)
+        if missing.any():
+            self.n_missing += int(missing.sum())
+            values = values[~missing]
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        if other.k != self.k:
+            raise ValueError("Can only merge sketches with the same k")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.n_missing += other.n_missing
+        self._compress()
+        return self
+
+    def weighted_items(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        return values, weights
+
+    def quantile(self, q, extra_value=None, extra_weight=0):
+        # Quantiles with np.quantile's linear interpolation (exact while no
+        # compaction has happened). extra_value/extra_weight add a point mass,
+        # e.g. missing values that will be imputed with the median.
+        values, weights = self.weighted_items()
+        if extra_weight:
+            values = np.append(values, extra_value)
+            weights = np.append(weights, float(extra_weight))
+        if len(values) == 0:
+            return np.full(np.shape(q), np.nan)
+        order = np.argsort(values, kind='stable')
+        values, weights = values[order], weights[order]
+        # Each item stands for `weight` consecutive ranks; use the middle one
+        positions = np.cumsum(weights) - weights + (weights - 1) / 2
+        return np.interp(np.asarray(q) * (weights.sum() - 1), positions, values)
+
+
+class SketchSet:
+    # One QuantileSketch per column of a 2-D array, fed chunk by chunk
+    def __init__(self, n_columns, k=K, seed=0):
+        self.sketches = [QuantileSketch(k, seed + j) for j in range(n_columns)]
+
+    def update(self, X):
+        X = np.asarray(X)
+        for j, sketch in enumerate(self.sketches):
+            sketch.update(X[:, j])
+        return self
+
+    def merge(self, other):
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        return self
+
+    def medians(self):
+        return np.array([s.quantile(0.5) for s in self.sketches])
+
+    def imputed_quantiles(self, q):
+        # (n_columns, len(q)) quantiles of the median-imputed columns: missing
+        # values count as a point mass at the median, as if fillna(median)
+        # ran before the quantiles were taken
+        medians = self.medians()
+        return np.array([s.quantile(q, medians[j], s.n_missing) for j, s in enumerate(self.sketches)])
@@ -0,0 +1,191 @@
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+from xgboost import XGBRegressor
+
+from export_model import MODEL_PATH, REPO_ROOT, SCALER_PATH, export_native
+from features import FEATURE_COLUMNS, NUMERIC_FEATURES, build_feature_matrix
+from hyperparameter_search import native_params
+from storage import load_table
+from streaming_scaler import StreamingRobustScaler
+
+# Quantile sketches of every row the deployed model has learned from; the
+# refresh merges new rows into them instead of re-reading the training set
+SKETCH_PATH = os.path.join(REPO_ROOT, 'scaler_sketches.pkl')
+
+# Boosting rounds added per refresh ('append' mode)
+REFRESH_ROUNDS = 20
+
+# Share of the new rows held out for the promotion check (together with the
+# training script's test split of the main dataset)
+HOLDOUT_FRACTION = 0.2
+
+# Largest shift of any feature's median or IQR, in units of the deployed
+# scaler's IQR, that a warm start accepts. The trees split on values scaled
+# with scaler.pkl, so past this point only a full retrain rescales them.
+MAX_DRIFT = 0.25
+
+# Tuned XGBRegressor parameters carried over from the deployed model (read
+# with getattr: older pickles predate get_params on this xgboost version)
+TUNED_PARAMS = ['max_depth', 'learning_rate', 'min_child_weight', 'subsample',
+                'colsample_bytree', 'gamma', 'reg_alpha', 'reg_lambda']
+
+
+def check_layout(scaler):
+    # Warm starts rebuild the one-hot FEATURE_COLUMNS matrix; a model trained
+    # on the categorical layout (binned codes, scaler over NUMERIC_FEATURES) or
+    # with spatial features would be fed the wrong columns
+    fitted_names = list(getattr(scaler, 'feature_names_in_', FEATURE_COLUMNS))
+    if fitted_names == NUMERIC_FEATURES:
+        raise ValueError("The deployed model uses the categorical feature layout, which refresh.py doesn't "
+                         "support; retrain with FEATURE_LAYOUT = 'onehot' in model/improved_xgboost_model.py")
+    if fitted_names != FEATURE_COLUMNS:
+        raise ValueError(f"Scaler was fitted on an unexpected feature layout: {fitted_names}")
+
+
+def model_params(model):
+    return {name: getattr(model, name) for name in TUNED_PARAMS if getattr(model, name, None) is not None}
+
+
+def main_split(seed=42):
+    # The training script's train/test split of the main dataset
+    df = load_table('main')
+    train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=0.2, random_state=seed)
+    return df.iloc[train_idx], df.iloc[test_idx]
+
+
+def raw_features(df):
+    return build_feature_matrix(df, out=np.empty((len(df), len(FEATURE_COLUMNS))))
+
+
+def scaled_features(df, scaler):
+    # Same arithmetic as scaler.transform: scale in float64, missing -> 0 (the median)
+    return np.nan_to_num(build_feature_matrix(df, center=scaler.center_, scale=scaler.scale_), nan=0.0)
+
+
+def load_sketches(path=SKETCH_PATH):
+    # Saved sketches, or (first refresh after a full retrain) sketches of the
+    # main dataset's training split, which the deployed scaler was fitted on
+    if os.path.exists(path):
+        return joblib.load(path)
+    train, _ = main_split()
+    return StreamingRobustScaler().fit(pd.DataFrame(raw_features(train), columns=FEATURE_COLUMNS))
+
+
+def drift(scaler, sketches):
+    # Per-feature shift of the median and IQR since the deployed scaler was
+    # fitted, in units of its IQR
+    center_shift = np.abs(sketches.center_ - scaler.center_) / scaler.scale_
+    scale_shift = np.abs(sketches.scale_ - scaler.scale_) / scaler.scale_
+    return pd.Series(np.maximum(center_shift, scale_shift), index=FEATURE_COLUMNS)
+
+
+def metrics(y_true, y_pred):
+    y_true = np.asarray(y_true, dtype=np.float64)
+    residual = y_true - y_pred
+    return {
+        'r2': 1 - (residual ** 2).sum() / ((y_true - y_true.mean()) ** 2).sum(),
+        'rmse': float(np.sqrt((residual ** 2).mean())),
+    }
+
+
+def warm_start(booster, params, X, y, mode='append', rounds=REFRESH_ROUNDS):
+    # 'append' boosts `rounds` more trees on the residuals of (X, y);
+    # 'refresh' keeps every tree's structure and re-fits its leaf values
+    dtrain = xgb.DMatrix(X, label=y)
+    native = native_params(params, seed=42)
+    if mode == 'refresh':
+        native.pop('tree_method')  # the refresh updater replaces the hist updater
+        native.update({'process_type': 'update', 'updater': 'refresh', 'refresh_leaf': True})
+        rounds = booster.num_boosted_rounds()
+    return xgb.train(native, dtrain, num_boost_round=rounds, xgb_model=booster.copy())
+
+
+def refresh(new, mode='append', rounds=REFRESH_ROUNDS, replay=False, promote=True,
+            max_drift=MAX_DRIFT, seed=42):
+    # Warm-start the deployed model on new counties/years (main-dataset
+    # columns) and promote it only if it does at least as well as the
+    # deployed model on the holdout. Returns a report dict.
+    start = time.perf_counter()
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    check_layout(scaler)
+    params = model_params(model)
+
+    new_train, new_holdout = train_test_split(new, test_size=HOLDOUT_FRACTION, random_state=seed)
+    main_train, main_test = main_split(seed)
+
+    # Incremental statistics: new training rows merged into the sketches
+    sketches = load_sketches()
+    sketches.partial_fit(pd.DataFrame(raw_features(new_train), columns=FEATURE_COLUMNS))
+    shift = drift(scaler, sketches)
+    report = {'mode': mode, 'rows': len(new_train), 'holdout_rows': len(new_holdout) + len(main_test),
+              'max_drift': float(shift.max()), 'drift_feature': shift.idxmax(), 'promoted': False}
+    if shift.max() > max_drift:
+        report['reason'] = 'drift'
+        report['seconds'] = time.perf_counter() - start
+        return report
+
+    train = pd.concat([main_train, new_train]) if replay else new_train
+    candidate = warm_start(model.get_booster(), params, scaled_features(train, scaler),
+                           train['median_aqi'].to_numpy(), mode, rounds)
+
+    holdout = pd.concat([main_test, new_holdout])
+    X_holdout = scaled_features(holdout, scaler)
+    report['current'] = metrics(holdout['median_aqi'], model.get_booster().inplace_predict(X_holdout))
+    report['candidate'] = metrics(holdout['median_aqi'], candidate.inplace_predict(X_holdout))
+
+    if report['candidate']['rmse'] > report['current']['rmse']:
+        report['reason'] = 'holdout'
+    elif promote:
+        refreshed = XGBRegressor(random_state=seed, n_estimators=candidate.num_boosted_rounds(), **params)
+        refreshed.load_model(bytearray(candidate.save_raw('ubj')))
+        joblib.dump(refreshed, MODEL_PATH)
+        export_native(refreshed, scaler)
+        joblib.dump(sketches, SKETCH_PATH)
+        report['promoted'] = True
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm-start the deployed model on new AQI rows and promote it if the holdout improves")
+    parser.add_argument('new', help="CSV of new rows with the main dataset's columns")
+    parser.add_argument('--mode', choices=['append', 'refresh'], default='append',
+                        help="add trees (append) or re-fit the existing trees' leaves (refresh)")
+    parser.add_argument('--rounds', type=int, default=REFRESH_ROUNDS)
+    parser.add_argument('--replay', action='store_true', help="also train on the main dataset's training split")
+    parser.add_argument('--dry-run', action='store_true', help="compare only; never overwrite the model")
+    parser.add_argument('--max-drift', type=float, default=MAX_DRIFT)
+    args = parser.parse_args()
+
+    from validation import failures, print_report, validate
+    new = pd.read_csv(args.new)
+    checked = validate(['main'], frames={'main': new}, rows_only=True)
+    if not checked['passed']:
+        print_report(checked)
+        raise SystemExit(f"{len(failures(checked))} validation failure(s) in '{args.new}'")
+
+    try:
+        report = refresh(new, args.mode, args.rounds, args.replay, not args.dry_run, args.max_drift)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"{report['rows']} new training rows, {report['holdout_rows']} holdout rows; "
+          f"largest drift {report['max_drift']:.3f} IQR ({report['drift_feature']})")
+    if report.get('reason') == 'drift':
+        raise SystemExit(f"Drift above {args.max_drift} IQR: the scaled splits are stale, run a full retrain "
+                         f"(python model/improved_xgboost_model.py)")
+    for name in ['current', 'candidate']:
+        print(f"{name:>10}: holdout R² {report[name]['r2']:.4f}, RMSE {report[name]['rmse']:.4f}")
+    if report['promoted']:
+        print(f"Promoted the refreshed model to '{MODEL_PATH}' (+ .ubj/.npz) in {report['seconds']:.1f}s")
+    elif report.get('reason') == 'holdout':
+        print(f"Kept the current model: the candidate's holdout RMSE is higher ({report['seconds']:.1f}s)")
+    else:
+        print(f"Dry run: nothing written ({report['seconds']:.1f}s)")
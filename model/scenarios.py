@@ -0,0 +1,225 @@
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import (
+    BASE_FEATURES, COLUMN_ALIASES, FALLBACK_EXPRESSIONS, FEATURE_COLUMNS, INPUT_COLUMNS,
+    build_feature_matrix, conflicting_inputs, evaluate_features, features_depending_on,
+)
+from storage import load_table
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(REPO_ROOT, 'best_xgboost_model.pkl')
+SCALER_PATH = os.path.join(REPO_ROOT, 'scaler.pkl')
+
+# County x scenario rows scored per predict call (and per Parquet row group);
+# the feature buffer is allocated once at this size
+BATCH_ROWS = 65536
+
+# Perturbation kinds: replace the input, multiply it or add to it
+OPERATIONS = {
+    'set': lambda base, value: value,
+    'scale': lambda base, value: base * value,
+    'delta': lambda base, value: base + value,
+}
+
+ID_COLUMNS = ['State', 'County']
+
+_ALIAS_OF = {column: alias for alias, column in COLUMN_ALIASES.items()}
+
+
+class ScenarioGrid:
+    # Cartesian product of perturbations, e.g. density scaled by [1, 1.1, 1.2]
+    # and income shifted by [-5000, 0, 5000] -> 9 scenarios. Never
+    # materialized: scenario s maps to one value per axis by unravel_index.
+    def __init__(self, perturbations):
+        # perturbations: [(input alias or column, operation, values), ...]
+        self.axes = []
+        for name, operation, values in perturbations:
+            column = COLUMN_ALIASES.get(name, name)
+            if column not in BASE_FEATURES:
+                raise KeyError(f"Cannot perturb {name!r}; numeric inputs are {sorted(COLUMN_ALIASES)}")
+            if operation not in OPERATIONS:
+                raise ValueError(f"Unknown operation {operation!r}. Choose from {sorted(OPERATIONS)}")
+            if any(column == axis[0] for axis in self.axes):
+                raise ValueError(f"{name!r} is perturbed twice")
+            label = f'{_ALIAS_OF.get(column, column)}_{operation}'
+            self.axes.append((column, operation, np.asarray(values, dtype=np.float64), label))
+        self.shape = tuple(len(axis[2]) for axis in self.axes)
+        self.columns = frozenset(axis[0] for axis in self.axes)
+        # Density follows population / land area (and log density follows
+        # density), so it can't also be perturbed on its own
+        conflicts = conflicting_inputs(self.columns)
+        if conflicts:
+            raise ValueError(f"{conflicts} are derived from other perturbed inputs; perturb one or the other")
+
+    def __len__(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    def values(self, scenarios):
+        # {label: value of each axis} for an array of scenario indices
+        index = np.unravel_index(scenarios, self.shape)
+        return {label: values[i] for (_, _, values, label), i in zip(self.axes, index)}
+
+    def apply(self, inputs, scenarios):
+        # Perturbed copies of the base inputs ({column: values}) for rows whose
+        # scenario indices are given
+        inputs = dict(inputs)
+        index = np.unravel_index(scenarios, self.shape)
+        for (column, operation, values, _), i in zip(self.axes, index):
+            inputs[column] = OPERATIONS[operation](inputs[column], values[i])
+        return inputs
+
+
+class ScenarioEngine:
+    # Scores counties x scenarios without building the full tensor: rows are
+    # taken BATCH_ROWS at a time from the flat (scenario, county) index. Each
+    # batch starts from the counties' cached scaled vectors and recomputes
+    # only the features that depend on the perturbed inputs.
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH, table=None, batch_rows=BATCH_ROWS):
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+        if list(getattr(scaler, 'feature_names_in_', FEATURE_COLUMNS)) != FEATURE_COLUMNS:
+            raise ValueError("Scaler was fitted on an unexpected feature layout")
+        self.booster = model.get_booster()
+        self.center = scaler.center_
+        self.scale = scaler.scale_
+        self.batch_rows = batch_rows
+
+        if table is None:
+            table = load_table('main', columns=ID_COLUMNS + INPUT_COLUMNS)
+        self.table = table.reset_index(drop=True)
+        # NaN scales to 0 (RobustScaler.center_ is the training median)
+        self.vectors = np.nan_to_num(build_feature_matrix(self.table, center=self.center, scale=self.scale), nan=0.0)
+        self.base_predictions = self.booster.inplace_predict(self.vectors)
+        self._buffer = np.empty((batch_rows, len(FEATURE_COLUMNS)), dtype=np.float32)
+
+    def select(self, where=None):
+        # Row positions of the counties matching a DataFrame.query expression
+        if where is None:
+            return np.arange(len(self.table))
+        return np.flatnonzero(self.table.eval(where).to_numpy(dtype=bool))
+
+    def _plan(self, grid):
+        # Features to recompute, their FEATURE_COLUMNS positions, and the base
+        # columns to read: previously engineered columns that depend on a
+        # perturbed input (log density, ...) are left out so they are rebuilt
+        # from their FALLBACK_EXPRESSIONS
+        features = features_depending_on(grid.columns)
+        positions = np.array([FEATURE_COLUMNS.index(f) for f in features], dtype=np.intp)
+        stale = {c for c in FALLBACK_EXPRESSIONS if c not in grid.columns and c in features}
+        inputs = [c for c in BASE_FEATURES if c not in stale]
+        return features, positions, inputs
+
+    def batches(self, grid, rows=None):
+        # Yields (county rows, scenario indices, predictions) per batch, in
+        # scenario-major order: every selected county under scenario 0, then 1, ...
+        rows = self.select() if rows is None else np.asarray(rows)
+        features, positions, inputs = self._plan(grid)
+        base = {column: self.table[column].to_numpy(dtype=np.float64, na_value=np.nan) for column in inputs}
+        total = len(grid) * len(rows)
+        for start in range(0, total, self.batch_rows):
+            flat = np.arange(start, min(start + self.batch_rows, total), dtype=np.int64)
+            scenarios, county = np.divmod(flat, len(rows))
+            county = rows[county]
+
+            X = self._buffer[:len(flat)]
+            np.take(self.vectors, county, axis=0, out=X)
+            if len(features):
+                perturbed = grid.apply({column: values[county] for column, values in base.items()}, scenarios)
+                values = evaluate_features(pd.DataFrame(perturbed, copy=False), features)
+                for name, position in zip(features, positions):
+                    scaled = (values[name] - self.center[position]) / self.scale[position]
+                    X[:, position] = np.nan_to_num(scaled, nan=0.0)
+            yield county, scenarios, self.booster.inplace_predict(X)
+
+    def run(self, grid, output=None, where=None):
+        # Score every selected county under every scenario, streaming rows to
+        # a Parquet file when output is given. Returns the per-scenario summary
+        # (mean prediction and mean change over the counties).
+        rows = self.select(where)
+        if len(rows) == 0:
+            raise ValueError(f"No counties match {where!r}")
+        totals = np.zeros(len(grid))
+        changes = np.zeros(len(grid))
+        writer = None
+        try:
+            for county, scenarios, predictions in self.batches(grid, rows):
+                change = predictions - self.base_predictions[county]
+                # A batch covers a contiguous run of scenarios
+                first = scenarios[0]
+                totals[first:scenarios[-1] + 1] += np.bincount(scenarios - first, weights=predictions)
+                changes[first:scenarios[-1] + 1] += np.bincount(scenarios - first, weights=change)
+                if output is not None:
+                    writer = self._write(writer, output, grid, county, scenarios, predictions, change)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        summary = pd.DataFrame(grid.values(np.arange(len(grid))))
+        summary['mean_predicted_aqi'] = totals / len(rows)
+        summary['mean_change'] = changes / len(rows)
+        summary.index.name = 'scenario'
+        return summary
+
+    def _write(self, writer, output, grid, county, scenarios, predictions, change):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = {column: pa.array(self.table[column].to_numpy()[county].astype(str)) for column in ID_COLUMNS}
+        columns['scenario'] = pa.array(scenarios)
+        columns.update({label: pa.array(values) for label, values in grid.values(scenarios).items()})
+        columns['base_median_aqi'] = pa.array(self.base_predictions[county])
+        columns['predicted_median_aqi'] = pa.array(predictions)
+        columns['change'] = pa.array(change)
+        batch = pa.table(columns)
+        if writer is None:
+            writer = pq.ParquetWriter(output, batch.schema)
+        writer.write_table(batch)
+        return writer
+
+
+def parse_values(text):
+    # '1,1.1,1.2' or an evenly spaced range 'start:stop:count'
+    if ':' in text:
+        start, stop, count = text.split(':')
+        return np.linspace(float(start), float(stop), int(count))
+    return [float(value) for value in text.split(',')]
+
+
+def parse_perturbations(args):
+    perturbations = []
+    for operation in OPERATIONS:
+        for pair in getattr(args, operation) or []:
+            name, _, values = pair.partition('=')
+            perturbations.append((name, operation, parse_values(values)))
+    return perturbations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predicted median AQI for counties under a grid of input scenarios")
+    parser.add_argument('output', nargs='?', help="Parquet file for every county x scenario row (optional)")
+    parser.add_argument('--set', nargs='*', metavar='COLUMN=VALUES', help="set an input, e.g. income=50000,60000")
+    parser.add_argument('--scale', nargs='*', metavar='COLUMN=VALUES', help="multiply an input, e.g. density=1,1.1,1.2")
+    parser.add_argument('--delta', nargs='*', metavar='COLUMN=VALUES', help="add to an input, e.g. income=-5000:5000:11")
+    parser.add_argument('--where', default=None, help="counties to include, e.g. \"Division == 'South Atlantic'\"")
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    grid = ScenarioGrid(parse_perturbations(args))
+    if not grid.axes:
+        parser.error("give at least one --set, --scale or --delta")
+    engine = ScenarioEngine(batch_rows=args.batch_rows)
+    n_counties = len(engine.select(args.where))
+    start = time.perf_counter()
+    summary = engine.run(grid, args.output, args.where)
+    elapsed = time.perf_counter() - start
+    print(summary.sort_values('mean_change').to_string(float_format=lambda v: f'{v:.4g}'))
+    destination = f" -> {args.output}" if args.output else ''
+    print(f"\nScored {n_counties} counties x {len(grid)} scenarios = {n_counties * len(grid)} rows "
+          f"in {elapsed:.2f}s{destination}")
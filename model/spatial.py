@@ -0,0 +1,161 @@
+import argparse
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from storage import TABLES, load_table
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(REPO_ROOT, '.build-cache')
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Neighbors averaged per county, and the distance floor in the inverse-distance
+# weights so a neighbor sharing an internal point doesn't dominate
+N_NEIGHBORS = 8
+MIN_DISTANCE_KM = 1.0
+
+SPATIAL_FEATURES = ['neighbor_aqi', 'neighbor_log_density', 'nearest_monitor_km']
+# The ones computed from the monitored counties (their labels and locations):
+# recomputed per CV fold from the fold's training counties
+MONITOR_FEATURES = ['neighbor_aqi', 'nearest_monitor_km']
+
+
+def to_xyz(latitude, longitude):
+    # Points on the unit sphere: Euclidean chord distance is monotone in
+    # great-circle distance, so a plain KD-tree gives exact nearest neighbors
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0))
+
+
+class SpatialIndex:
+    # KD-tree over county internal points (or any FIPS/lat/lon table, e.g. tracts)
+    def __init__(self, fips, xyz, tree=None):
+        self.fips = np.asarray(fips)
+        self.xyz = xyz
+        self.tree = cKDTree(xyz) if tree is None else tree
+        self._row = pd.Series(np.arange(len(self.fips)), index=self.fips)
+
+    def points(self, fips):
+        # xyz for each FIPS code; NaN where the code isn't indexed
+        rows = self._row.reindex(np.asarray(fips)).to_numpy()
+        out = np.full((len(rows), 3), np.nan)
+        found = ~np.isnan(rows)
+        out[found] = self.xyz[rows[found].astype(np.intp)]
+        return out
+
+
+def load_index(table='county_points'):
+    # Index over the county_points table. The built tree is pickled in the
+    # build cache keyed by the table's content, so it is built once per
+    # GEOINFO/density version (plain arrays + cKDTree, whichever script loads it)
+    with open(TABLES[table], 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, f'spatial-index-{table}-{digest}.pkl')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return SpatialIndex(**pickle.load(f))
+    points = load_table(table, columns=['FIPS', 'Latitude', 'Longitude'])
+    index = SpatialIndex(points['FIPS'].to_numpy(), to_xyz(points['Latitude'], points['Longitude']))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump({'fips': index.fips, 'xyz': index.xyz, 'tree': index.tree}, f)
+    return index
+
+
+def neighbor_aggregate(target_xyz, target_fips, source_xyz, source_fips, source_values, k=N_NEIGHBORS, tree=None):
+    # Inverse-distance-weighted mean of source_values over each target's k
+    # nearest sources, leaving out sources with the target's own FIPS
+    # (leave-one-out, duplicates included), plus the distance to the nearest
+    # remaining source. One vectorized KD-tree query for all targets.
+    source_fips = np.asarray(source_fips)
+    source_values = np.asarray(source_values, dtype=np.float64)
+    n_targets = len(target_xyz)
+    means = np.full(n_targets, np.nan)
+    nearest = np.full(n_targets, np.nan)
+    valid_targets = ~np.isnan(target_xyz).any(axis=1)
+    if not valid_targets.any() or len(source_xyz) == 0:
+        return means, nearest
+
+    # Extra candidates cover every source row sharing the target's FIPS
+    n_extra = int(pd.Series(source_fips).value_counts().max())
+    k_query = min(k + n_extra, len(source_xyz))
+    if tree is None:
+        tree = cKDTree(source_xyz)
+    chord, idx = tree.query(target_xyz[valid_targets], k=k_query)
+    chord, idx = chord.reshape(len(idx), -1), idx.reshape(len(idx), -1)
+
+    keep = source_fips[idx] != np.asarray(target_fips)[valid_targets][:, None]
+    keep &= np.cumsum(keep, axis=1) <= k
+    distance = np.maximum(chord_to_km(chord), MIN_DISTANCE_KM)
+    weights = np.where(keep, 1 / distance, 0.0)
+    values = source_values[idx]
+    weights[np.isnan(values)] = 0.0
+    total = weights.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        means[valid_targets] = np.where(total > 0, (weights * np.nan_to_num(values)).sum(axis=1) / total, np.nan)
+    nearest[valid_targets] = np.where(keep.any(axis=1), np.where(keep, chord_to_km(chord), np.inf).min(axis=1), np.nan)
+    return means, nearest
+
+
+def spatial_features(fips, monitor_fips, monitor_aqi, index=None, k=N_NEIGHBORS):
+    # SPATIAL_FEATURES for the counties in fips. Neighbor AQI and the nearest
+    # monitor come from the monitored counties given (pass only training rows
+    # to keep test labels out); neighbor density uses every indexed county.
+    if index is None:
+        index = load_index()
+    fips = np.asarray(fips)
+    target_xyz = index.points(fips)
+
+    monitor_fips = np.asarray(monitor_fips)
+    monitor_xyz = index.points(monitor_fips)
+    located = ~np.isnan(monitor_xyz).any(axis=1)
+    neighbor_aqi, nearest_monitor = neighbor_aggregate(
+        target_xyz, fips, monitor_xyz[located], monitor_fips[located], np.asarray(monitor_aqi)[located], k)
+
+    density = load_table('county_points', columns=['FIPS', 'population_density'])
+    density = density.set_index('FIPS')['population_density'].reindex(index.fips).to_numpy()
+    neighbor_density, _ = neighbor_aggregate(target_xyz, fips, index.xyz, index.fips, np.log1p(density), k, index.tree)
+
+    return pd.DataFrame({
+        'neighbor_aqi': neighbor_aqi,
+        'neighbor_log_density': neighbor_density,
+        'nearest_monitor_km': nearest_monitor,
+    })
+
+
+def county_fips(df):
+    # FIPS for main-dataset rows: the table's own column, or (older tables)
+    # the persisted EPA State/County index
+    if 'FIPS' in df.columns:
+        return df['FIPS'].to_numpy()
+    index = load_table('county_index', columns=['State', 'County', 'FIPS'])
+    lookup = dict(zip(zip(index['State'].astype(str), index['County'].astype(str)), index['FIPS']))
+    return np.array([lookup.get(key, -1) for key in zip(df['State'].astype(str), df['County'].astype(str))])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spatial neighbor features for every monitored county")
+    parser.add_argument('--output', default=None, help="optional CSV of State, County and the spatial features")
+    parser.add_argument('-k', type=int, default=N_NEIGHBORS)
+    args = parser.parse_args()
+
+    df = load_table('main', columns=['State', 'County', 'FIPS', 'median_aqi'])
+    fips = county_fips(df)
+    features = spatial_features(fips, fips, df['median_aqi'], k=args.k)
+    print(features.describe().T[['mean', 'min', 'max']])
+    corr = np.corrcoef(features['neighbor_aqi'], df['median_aqi'])[0, 1]
+    print(f"\nCorrelation of leave-one-out neighbor AQI with median AQI: {corr:.3f}")
+    if args.output:
+        pd.concat([df[['State', 'County']], features], axis=1).to_csv(args.output, index=False)
+        print(f"Saved spatial features to '{args.output}'")
@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from county_index import parse_geo_id
+
+# File Paths
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.path.join(REPO_ROOT, '.columnar-store')
+
+# Tables served from the columnar store, keyed by name -> source CSV
+TABLES = {
+    'main': os.path.join(REPO_ROOT, 'main-dataset', 'main-dataset.csv'),
+    'aqi': os.path.join(REPO_ROOT, 'cleaned-datasets', 'aqi-by-county', 'Access_to_a_Livable_Planet_Dataset_cleaned.csv'),
+    'ml_target': os.path.join(REPO_ROOT, 'cleaned-datasets', 'aqi-by-county', 'ml_target_dataset.csv'),
+    'income': os.path.join(REPO_ROOT, 'cleaned-datasets', 'household-income-by-county', 'cleaned-income-by-county.csv'),
+    'population': os.path.join(REPO_ROOT, 'cleaned-datasets', 'populationDensity-by-county', 'cleaned-population-by-county.csv'),
+    'density': os.path.join(REPO_ROOT, 'cleaned-datasets', 'populationDensity-by-county', 'cleaned-population-density-by-county.csv'),
+    'race': os.path.join(REPO_ROOT, 'cleaned-datasets', 'race-by-county', 'cleaned-race-by-county.csv'),
+    'county_index': os.path.join(REPO_ROOT, 'cleaned-datasets', 'aqi-by-county', 'epa-county-fips.csv'),
+    'county_points': os.path.join(REPO_ROOT, 'cleaned-datasets', 'populationDensity-by-county', 'county-internal-points.csv'),
+}
+
+CATEGORICAL_COLUMNS = ['State', 'Region', 'Division']
+
+
+def table_path(name):
+    return os.path.join(STORE_DIR, f'{name}.arrow')
+
+
+def compact_dtypes(df, lossy_float32=False):
+    # Categorical State/Region/Division, int32 counts and FIPS derived from GEO_ID.
+    # Floats become float32 only when that round-trips exactly: the trained
+    # booster's split thresholds sit on training values, and rounding e.g.
+    # '% Asian alone' to float32 flips predictions for ~170 of 942 counties.
+    df = df.copy()
+    if 'GEO_ID' in df.columns and 'FIPS' not in df.columns:
+        df.insert(0, 'FIPS', parse_geo_id(df['GEO_ID']))
+    for col in df.columns:
+        values = df[col]
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = values.astype('category')
+        elif pd.api.types.is_integer_dtype(values):
+            if values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max:
+                df[col] = values.astype(np.int32)
+        elif pd.api.types.is_float_dtype(values):
+            as_float32 = values.astype(np.float32)
+            if lossy_float32 or np.array_equal(as_float32.to_numpy(np.float64), values.to_numpy(), equal_nan=True):
+                df[col] = as_float32
+    return df
+
+
+def write_table(name, df=None, lossy_float32=False):
+    # Convert a table (default: its source CSV) to an uncompressed Arrow IPC
+    # file, which readers memory-map without parsing or copying
+    if df is None:
+        df = pd.read_csv(TABLES[name])
+    df = compact_dtypes(df, lossy_float32=lossy_float32)
+    os.makedirs(STORE_DIR, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = table_path(name) + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, table_path(name))
+    return table_path(name)
+
+
+def _is_stale(name):
+    path = table_path(name)
+    if not os.path.exists(path):
+        return True
+    source = TABLES.get(name)
+    return source is not None and os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path)
+
+
+def load_arrow(name, columns=None):
+    # Memory-mapped Arrow table with column projection; (re)builds the columnar
+    # copy from the source CSV when it is missing or older than the CSV
+    if _is_stale(name):
+        write_table(name)
+    source = pa.memory_map(table_path(name), 'r')
+    table = ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(list(columns))
+    return table
+
+
+def load_table(name, columns=None):
+    # Drop-in replacement for pd.read_csv(<table csv>, usecols=columns)
+    return load_arrow(name, columns).to_pandas()
@@ -0,0 +1,221 @@
+import argparse
+import copy
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import RobustScaler
+
+from quantile_sketch import K, SketchSet
+
+# Rows converted to float64 at a time when transforming a float32 buffer
+BLOCK_ROWS = 65536
+
+# Accuracy of the sketched statistics: exact while a column has fewer than K
+# non-missing values; beyond that the median and quartiles are within this
+# fraction of the rows (in rank) of the exact ones
+RANK_TOLERANCE = 0.005
+
+
+def _sketch_shard(X, k, seed):
+    return SketchSet(X.shape[1], k, seed).update(X)
+
+
+class StreamingRobustScaler:
+    # Median imputer + RobustScaler fitted from mergeable quantile sketches, a
+    # drop-in for X.fillna(X.median()) followed by RobustScaler().fit_transform.
+    # fit / partial_fit / fit_parallel / merge accumulate chunks or shards;
+    # transform imputes missing values with the median and can scale in place.
+    def __init__(self, quantile_range=(25.0, 75.0), k=K, seed=0):
+        self.quantile_range = quantile_range
+        self.k = k
+        self.seed = seed
+        self.sketches = None
+        self.n_samples_seen_ = 0
+        self._stats = None
+
+    def partial_fit(self, X):
+        X, names = _as_array(X)
+        if self.sketches is None:
+            self.sketches = SketchSet(X.shape[1], self.k, self.seed)
+            self.n_features_in_ = X.shape[1]
+            if names is not None:
+                self.feature_names_in_ = names
+        self.sketches.update(X)
+        self.n_samples_seen_ += len(X)
+        self._stats = None
+        return self
+
+    def fit(self, X):
+        self.sketches = None
+        self.n_samples_seen_ = 0
+        return self.partial_fit(X)
+
+    def fit_parallel(self, shards, n_workers=None):
+        # Sketch each shard in its own process and merge the results
+        shards = [_as_array(shard)[0] for shard in shards]
+        n_workers = n_workers or min(len(shards), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_sketch_shard, shard, self.k, self.seed + i) for i, shard in enumerate(shards)]
+            parts = [future.result() for future in futures]
+        self.sketches = None
+        self.n_samples_seen_ = 0
+        for part, shard in zip(parts, shards):
+            self._merge_sketches(part, shard.shape[1], len(shard))
+        return self
+
+    def merge(self, other):
+        # Combine with a scaler fitted on a different shard of the same columns.
+        # An unfitted scaler adopts a copy, so later updates leave other alone.
+        self._merge_sketches(copy.deepcopy(other.sketches), other.n_features_in_, other.n_samples_seen_)
+        return self
+
+    def _merge_sketches(self, sketches, n_features, n_samples):
+        if self.sketches is None:
+            self.sketches = sketches
+            self.n_features_in_ = n_features
+        else:
+            self.sketches.merge(sketches)
+        self.n_samples_seen_ += n_samples
+        self._stats = None
+
+    def _statistics(self):
+        if self._stats is None:
+            low, high = self.quantile_range
+            quantiles = self.sketches.imputed_quantiles([0.5, low / 100, high / 100])
+            scale = quantiles[:, 2] - quantiles[:, 1]
+            # Constant columns keep their values (sklearn's _handle_zeros_in_scale)
+            scale[scale == 0.0] = 1.0
+            self._stats = quantiles, scale
+        return self._stats
+
+    @property
+    def center_(self):
+        # Training medians: the imputation values and the RobustScaler center
+        return self._statistics()[0][:, 0]
+
+    @property
+    def quantiles_(self):
+        # (n_features, 2) lower/upper quantiles of the median-imputed columns
+        return self._statistics()[0][:, 1:]
+
+    @property
+    def scale_(self):
+        return self._statistics()[1]
+
+    def transform(self, X, copy=True):
+        # Impute + scale. With copy=False a float32/float64 ndarray is updated
+        # in place; float32 is widened to float64 block by block for the
+        # arithmetic, so results equal scaling in float64 and then casting
+        if not _is_float_array(X):
+            X = _as_array(X)[0]
+            copy = False
+        if copy:
+            X = X.copy()
+        center, scale = self.center_, self.scale_
+        if X.dtype == np.float64:
+            _scale_block(X, center, scale)
+            return X
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS].astype(np.float64)
+            _scale_block(block, center, scale)
+            X[start:start + BLOCK_ROWS] = block
+        return X
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def to_robust_scaler(self):
+        # Equivalent fitted sklearn RobustScaler, for scaler.pkl consumers
+        scaler = RobustScaler(quantile_range=self.quantile_range)
+        scaler.center_ = np.array(self.center_, dtype=np.float64)
+        scaler.scale_ = np.array(self.scale_, dtype=np.float64)
+        scaler.n_features_in_ = self.n_features_in_
+        if hasattr(self, 'feature_names_in_'):
+            scaler.feature_names_in_ = self.feature_names_in_
+        return scaler
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_stats'] = None
+        return state
+
+
+def _is_float_array(X):
+    return isinstance(X, np.ndarray) and X.ndim == 2 and X.dtype in (np.float32, np.float64)
+
+
+def _as_array(X):
+    # (2-D float ndarray, feature names or None)
+    if isinstance(X, pd.DataFrame):
+        return X.to_numpy(dtype=np.float64, na_value=np.nan), np.asarray(X.columns, dtype=object)
+    X = np.asarray(X)
+    if not _is_float_array(X):
+        X = np.atleast_2d(X).astype(np.float64)
+    return X, None
+
+
+def _scale_block(block, center, scale):
+    # Same operations as RobustScaler.transform, then median imputation (0)
+    block -= center
+    block /= scale
+    np.nan_to_num(block, copy=False, nan=0.0)
+
+
+def rank_errors(X, scaler):
+    # Per column, how far (as a fraction of rows) the sketched median and
+    # quartiles sit from the exact ones on the median-imputed data
+    X = _as_array(X)[0]
+    qs = [0.5, scaler.quantile_range[0] / 100, scaler.quantile_range[1] / 100]
+    estimates = np.column_stack([scaler.center_, scaler.quantiles_])
+    errors = np.zeros(X.shape[1])
+    for j in range(X.shape[1]):
+        column = np.sort(np.where(np.isnan(X[:, j]), scaler.center_[j], X[:, j]))
+        n = len(column)
+        for q, value in zip(qs, estimates[j]):
+            # Ranks whose interpolated quantile could equal value
+            lo = np.searchsorted(column, value, 'left') - 1
+            hi = np.searchsorted(column, value, 'right')
+            target = q * (n - 1)
+            errors[j] = max(errors[j], max(lo - target, target - hi, 0) / n)
+    return errors
+
+
+if __name__ == "__main__":
+    from features import FEATURE_COLUMNS, create_features, encode_features
+    from storage import load_table
+    from sklearn.model_selection import train_test_split
+
+    parser = argparse.ArgumentParser(description="Check sketched scaler statistics against the exact ones")
+    parser.add_argument('--rows', type=int, default=2_000_000, help="rows in the synthetic accuracy check")
+    parser.add_argument('--shards', type=int, default=8)
+    args = parser.parse_args()
+
+    # Training-script data: sketches are exact below K rows per column
+    df = encode_features(create_features(load_table('main')))
+    X_train, _ = train_test_split(df[FEATURE_COLUMNS], test_size=0.2, random_state=42)
+    exact = RobustScaler().fit(X_train.fillna(X_train.median()))
+    streaming = StreamingRobustScaler().fit_parallel(np.array_split(X_train.to_numpy(dtype=np.float64), args.shards))
+    print(f"main-dataset ({len(X_train)} rows): max |center diff| {np.abs(streaming.center_ - exact.center_).max():.3g}, "
+          f"max |scale diff| {np.abs(streaming.scale_ - exact.scale_).max():.3g}")
+
+    # Large synthetic columns: approximate, merged from per-shard sketches
+    rng = np.random.default_rng(42)
+    X = np.column_stack([rng.lognormal(size=args.rows), rng.normal(size=args.rows), rng.exponential(size=args.rows)])
+    X[rng.random(args.rows) < 0.05, 0] = np.nan
+    start = time.perf_counter()
+    streaming = StreamingRobustScaler().fit_parallel(np.array_split(X, args.shards))
+    sketch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    filled = pd.DataFrame(X).fillna(pd.DataFrame(X).median())
+    exact = RobustScaler().fit(filled)
+    exact_seconds = time.perf_counter() - start
+    errors = rank_errors(X, streaming)
+    print(f"synthetic ({args.rows} rows, {args.shards} shards): worst rank error {errors.max():.4%} "
+          f"(tolerance {RANK_TOLERANCE:.2%}), sketch {sketch_seconds:.2f}s vs exact {exact_seconds:.2f}s")
+
+    buffer = X.astype(np.float32)
+    streaming.transform(buffer, copy=False)
+    print(f"float32 in-place transform: max |diff| vs float64 {np.abs(buffer - streaming.transform(X)).max():.3g}")
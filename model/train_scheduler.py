@@ -0,0 +1,143 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import xgboost as xgb
+
+from hyperparameter_search import native_params
+
+# OpenMP threads given to each worker's xgb.train
+THREADS_PER_WORKER = 4
+
+
+class SharedArray:
+    # A NumPy array in POSIX shared memory; only (name, shape, dtype) is pickled to workers
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.spec = (self.shm.name, array.shape, array.dtype.str)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)[...] = array
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Worker-side: shared segments attached so far, by name, and whether this
+# worker runs its own resource tracker (set on the first attach)
+_ATTACHED = {}
+_OWN_TRACKER = None
+
+
+def _attach(*specs):
+    # Map the given segments, dropping ones left over from earlier runs
+    names = {spec[0] for spec in specs}
+    for name in list(_ATTACHED):
+        if name not in names:
+            _ATTACHED.pop(name)[0].close()
+    return [_attach_one(spec) for spec in specs]
+
+
+def _attach_one(spec):
+    global _OWN_TRACKER
+    name, shape, dtype = spec
+    if name not in _ATTACHED:
+        if _OWN_TRACKER is None:
+            # Forked workers start their own tracker; spawned ones share the parent's
+            _OWN_TRACKER = resource_tracker._resource_tracker._fd is None
+        shm = shared_memory.SharedMemory(name=name)
+        # The parent owns and unlinks the segment; stop a tracker of this
+        # worker's own from unlinking it (and warning) when the worker exits.
+        # A shared tracker keeps the parent's registration for that unlink.
+        if _OWN_TRACKER:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        _ATTACHED[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    return _ATTACHED[name][1]
+
+
+class TrainJob:
+    # One independent booster: params (XGBRegressor names) trained on all rows,
+    # an index subset (rows) or a bootstrap resample drawn from bootstrap_seed
+    def __init__(self, name, params, rows=None, bootstrap_seed=None, seed=42):
+        self.name = name
+        self.params = dict(params)
+        self.rows = None if rows is None else np.asarray(rows)
+        self.bootstrap_seed = bootstrap_seed
+        self.seed = seed
+
+
+def _run_job(job, X_spec, y_spec, nthread, feature_types=None):
+    start = time.perf_counter()
+    X, y = _attach(X_spec, y_spec)
+    rows = job.rows
+    if job.bootstrap_seed is not None:
+        base = np.arange(len(y)) if rows is None else rows
+        rows = np.random.default_rng(job.bootstrap_seed).choice(base, size=len(base), replace=True)
+    if rows is not None:
+        X, y = X[rows], y[rows]
+
+    dtrain = xgb.QuantileDMatrix(X, label=y, nthread=nthread, feature_types=feature_types,
+                                 enable_categorical=feature_types is not None)
+    native = native_params(job.params, job.seed, nthread)
+    booster = xgb.train(native, dtrain, num_boost_round=job.params.get('n_estimators', 100))
+    return job.name, booster.save_raw('ubj'), len(y), time.perf_counter() - start
+
+
+def _noop():
+    return os.getpid()
+
+
+class TrainScheduler:
+    # Process pool for independent XGBoost fits with an explicit thread budget:
+    # n_workers * threads_per_worker <= cores, so workers don't oversubscribe.
+    # Workers use the platform's default start method. Where that is fork
+    # (Linux), create it before any XGBoost training in the parent: workers are
+    # forked right away, while the parent's OpenMP runtime is still untouched
+    # (libgomp is not fork-safe once its thread pool exists). Spawned workers
+    # (macOS, Windows) start clean and import _run_job from this module.
+    def __init__(self, n_workers=None, threads_per_worker=None):
+        cores = os.cpu_count() or 1
+        if threads_per_worker is None:
+            threads_per_worker = min(THREADS_PER_WORKER, cores)
+        if n_workers is None:
+            n_workers = max(1, cores // threads_per_worker)
+        self.n_workers = n_workers
+        self.threads_per_worker = threads_per_worker
+        self.pool = ProcessPoolExecutor(max_workers=n_workers)
+        # With the fork context every worker is started on the first submit
+        self.pool.submit(_noop).result()
+
+    def run(self, jobs, X, y, feature_types=None):
+        # Train every job; returns {name: {'booster', 'n_rows', 'seconds'}}.
+        # feature_types marks category-code columns ('c'), as in FoldCache
+        X_shared = SharedArray(np.asarray(X, dtype=np.float32))
+        y_shared = SharedArray(np.asarray(y, dtype=np.float32))
+        results = {}
+        try:
+            futures = [self.pool.submit(_run_job, job, X_shared.spec, y_shared.spec, self.threads_per_worker, feature_types)
+                       for job in jobs]
+            for future in as_completed(futures):
+                name, raw, n_rows, seconds = future.result()
+                booster = xgb.Booster(model_file=bytearray(raw))
+                results[name] = {'booster': booster, 'n_rows': n_rows, 'seconds': seconds}
+        finally:
+            X_shared.release()
+            y_shared.release()
+        return results
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+def region_jobs(params, regions, prefix='region'):
+    # One job per distinct value of regions (e.g. the training rows' Region)
+    regions = np.asarray(regions)
+    return [TrainJob(f'{prefix}:{r}', params, rows=np.flatnonzero(regions == r))
+            for r in sorted(set(regions.tolist()))]
+
+
+def bootstrap_jobs(params, n_replicates, seed=42, rows=None):
+    return [TrainJob(f'bootstrap:{i}', params, rows=rows, bootstrap_seed=seed + i, seed=seed + i)
+            for i in range(n_replicates)]
@@ -0,0 +1,384 @@
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from features import DIVISIONS, REGIONS
+from storage import compact_dtypes, load_table
+
+RACE_COLUMNS = [
+    '% Hispanic or Latino', '% White alone', '% Black or African American alone',
+    '% American Indian and Alaska Native alone', '% Asian alone', '% Two or More Races',
+]
+AQI_CATEGORY_DAYS = [
+    'Good Days', 'Moderate Days', 'Unhealthy for Sensitive Groups Days',
+    'Unhealthy Days', 'Very Unhealthy Days', 'Hazardous Days',
+]
+AQI_POLLUTANT_DAYS = ['Days CO', 'Days NO2', 'Days Ozone', 'Days PM2.5', 'Days PM10']
+
+
+# ---------------------------------------------------------------------------
+# Rules: declared once per table in SCHEMAS, evaluated by validate()
+
+class Column:
+    # Expected kind ('number', 'int', 'string' or 'category'), inclusive
+    # value range, allowed values, regex pattern and whether nulls are allowed
+    def __init__(self, kind='number', min=None, max=None, values=None, pattern=None, nullable=False):
+        self.kind = kind
+        self.min = min
+        self.max = max
+        self.values = values
+        self.pattern = pattern
+        self.nullable = nullable
+
+
+class Unique:
+    def __init__(self, columns, where=None, severity='error'):
+        self.columns = list(columns)
+        self.where = where
+        self.severity = severity
+
+    def __str__(self):
+        return f"unique {self.columns}" + (f" where {self.where}" if self.where else '')
+
+
+class Reference:
+    # Every key in this table (optionally filtered by `where`) exists in table
+    def __init__(self, columns, table, target_columns=None, where=None, severity='error'):
+        self.columns = list(columns)
+        self.table = table
+        self.target_columns = list(target_columns or columns)
+        self.where = where
+        self.severity = severity
+
+    def __str__(self):
+        return f"{self.columns} in {self.table}{self.target_columns}" + (f" where {self.where}" if self.where else '')
+
+
+class Check:
+    # Row-level boolean expression, evaluated with DataFrame.eval
+    def __init__(self, expr, severity='error'):
+        self.expr = expr
+        self.severity = severity
+
+    def __str__(self):
+        return self.expr
+
+
+class Lookup:
+    # A known row (e.g. Los Angeles County) exists and its value is in range
+    def __init__(self, key_column, key, column, min=None, max=None, severity='error'):
+        self.key_column = key_column
+        self.key = key
+        self.column = column
+        self.min = min
+        self.max = max
+        self.severity = severity
+
+    def __str__(self):
+        return f"{self.column} of {self.key} in [{self.min}, {self.max}]"
+
+
+class Schema:
+    def __init__(self, table, columns, min_rows=1, rules=()):
+        self.table = table
+        self.columns = columns
+        self.min_rows = min_rows
+        self.rules = list(rules)
+
+
+PERCENT = Column(min=0, max=100)
+ACS_KEYS = {
+    'FIPS': Column('int', min=1000, max=78999),
+    'GEO_ID': Column('string', pattern=r'0500000US\d{5}'),
+    'County_Area': Column('string'),
+}
+EPA_KEYS = {'State': Column('category'), 'County': Column('string'), 'Year': Column('int', min=1980, max=2100)}
+
+SCHEMAS = {schema.table: schema for schema in [
+    Schema('population', {**ACS_KEYS, 'Total_Population': Column('int', min=0)}, min_rows=3000, rules=[
+        Unique(['FIPS']),
+        Lookup('County_Area', 'Los Angeles County, California', 'Total_Population', min=9_000_000),
+    ]),
+    Schema('income', {**ACS_KEYS, 'Median_Household_Income': Column(min=0)}, min_rows=3000, rules=[
+        Unique(['FIPS']),
+        Reference(['FIPS'], 'population'),
+    ]),
+    Schema('race', {**ACS_KEYS, **{col: PERCENT for col in RACE_COLUMNS}}, min_rows=3000, rules=[
+        Unique(['FIPS']),
+        Reference(['FIPS'], 'population'),
+    ]),
+    Schema('density', {
+        **ACS_KEYS,
+        'Total_Population': Column('int', min=0),
+        'Land_Area_SqMi': Column(min=0),
+        'population_density': Column(min=0),
+    }, min_rows=3000, rules=[
+        Unique(['FIPS']),
+        Reference(['FIPS'], 'population'),
+        Check('abs(population_density * Land_Area_SqMi - Total_Population) <= 1e-6 * Total_Population + 1e-6'),
+        Lookup('County_Area', 'New York County, New York', 'population_density', min=10_000, severity='warning'),
+        Lookup('County_Area', 'Los Angeles County, California', 'population_density', min=1_000),
+    ]),
+    Schema('county_points', {
+        'FIPS': ACS_KEYS['FIPS'],
+        'County_Area': Column('string'),
+        'Latitude': Column(min=-90, max=90),
+        'Longitude': Column(min=-180, max=180),
+        'population_density': Column(min=0),
+    }, min_rows=3000, rules=[
+        Unique(['FIPS']),
+        Reference(['FIPS'], 'density'),
+    ]),
+    Schema('aqi', {
+        **EPA_KEYS,
+        **{col: Column('int', min=0, max=366) for col in ['Days with AQI'] + AQI_CATEGORY_DAYS + AQI_POLLUTANT_DAYS},
+        'Max AQI': Column('int', min=0),
+        '90th Percentile AQI': Column('int', min=0, max=500),
+        'Median AQI': Column('int', min=0, max=500),
+    }, min_rows=500, rules=[
+        Unique(['State', 'County', 'Year']),
+        Check(' + '.join(f'`{col}`' for col in AQI_CATEGORY_DAYS) + ' == `Days with AQI`'),
+        Check(' + '.join(f'`{col}`' for col in AQI_POLLUTANT_DAYS) + ' == `Days with AQI`'),
+        Check('`Median AQI` <= `90th Percentile AQI` <= `Max AQI`'),
+    ]),
+    Schema('ml_target', {
+        **EPA_KEYS,
+        'median_aqi': Column('int', min=0, max=500),
+        'sample_weight': Column(min=0, max=1),
+    }, min_rows=500, rules=[
+        Unique(['State', 'County', 'Year']),
+        Reference(['State', 'County', 'Year'], 'aqi'),
+        Check('sample_weight > 0'),
+    ]),
+    Schema('county_index', {'State': Column('category'), 'County': Column('string'), 'FIPS': Column('int', min=-1)},
+           min_rows=500, rules=[
+        Unique(['State', 'County']),
+        Reference(['State', 'County'], 'aqi'),
+        Reference(['FIPS'], 'population', where='FIPS >= 0'),
+        # Unresolved EPA names are kept as -1 and dropped from main
+        Check('FIPS >= 0', severity='warning'),
+    ]),
+    Schema('main', {
+        **EPA_KEYS,
+        'FIPS': ACS_KEYS['FIPS'],
+        'median_aqi': Column('int', min=0, max=500),
+        'sample_weight': Column(min=0, max=1),
+        **{col: PERCENT for col in RACE_COLUMNS},
+        'Median_Household_Income': Column(min=0),
+        'Total_Population': Column('int', min=0),
+        'Land_Area_SqMi': Column(min=0),
+        'population_density': Column(min=0),
+        'Region': Column('category', values=REGIONS),
+        'Division': Column('category', values=DIVISIONS),
+        'log_population_density': Column(),
+        'log_median_income': Column(),
+        'total_minority_pct': Column(min=0, max=200),
+    }, min_rows=900, rules=[
+        Reference(['State', 'County'], 'county_index'),
+        Reference(['State', 'County', 'FIPS'], 'county_index'),
+        Reference(['State', 'County', 'Year', 'median_aqi'], 'ml_target'),
+        # One row per EPA county and per Census county each year: a repeated
+        # key means a join matched one county's row to two others
+        Unique(['State', 'County', 'Year']),
+        Unique(['FIPS', 'Year']),
+        Check('abs(log_population_density - log1p(population_density)) <= 1e-9'),
+        Check('abs(log_median_income - log(Median_Household_Income)) <= 1e-6'),
+        Check('abs(total_minority_pct - `% Hispanic or Latino` - `% Black or African American alone`) <= 1e-9'),
+        Check('abs(population_density * Land_Area_SqMi - Total_Population) <= 1e-6 * Total_Population + 1e-6'),
+    ]),
+]}
+
+
+# ---------------------------------------------------------------------------
+# Engine
+
+def _result(check, severity, failures, detail=None):
+    status = 'pass' if failures == 0 else ('warn' if severity == 'warning' else 'fail')
+    result = {'check': check, 'status': status, 'failures': int(failures)}
+    if failures and detail is not None:
+        result['detail'] = detail
+    return result
+
+
+def _sample(values, n=5):
+    return [str(v) for v in list(values)[:n]]
+
+
+def _kind_ok(series, kind):
+    if kind == 'int':
+        return pd.api.types.is_integer_dtype(series)
+    if kind == 'number':
+        return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+    if kind == 'category':
+        return isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(series)
+    return pd.api.types.is_string_dtype(series) or pd.api.types.is_object_dtype(series)
+
+
+def _check_columns(df, schema):
+    # All column checks from one pass of column-wise reductions: null counts
+    # and min/max over the numeric block, range counts only where min/max fail
+    results = []
+    missing = [col for col in schema.columns if col not in df.columns]
+    results.append(_result('columns present', 'error', len(missing), missing))
+    present = {col: spec for col, spec in schema.columns.items() if col in df.columns}
+    nulls = df[list(present)].isna().sum()
+    numeric = [col for col, spec in present.items() if spec.kind in ('int', 'number') and _kind_ok(df[col], spec.kind)]
+    lows, highs = df[numeric].min(), df[numeric].max()
+
+    for col, spec in present.items():
+        series = df[col]
+        if not _kind_ok(series, spec.kind):
+            results.append(_result(f'{col}: {spec.kind}', 'error', 1, str(series.dtype)))
+            continue
+        if not spec.nullable:
+            results.append(_result(f'{col}: not null', 'error', nulls[col]))
+        if spec.min is not None or spec.max is not None:
+            low = -np.inf if spec.min is None else spec.min
+            high = np.inf if spec.max is None else spec.max
+            failures = 0
+            if lows[col] < low or highs[col] > high:
+                failures = int((~series.between(low, high) & series.notna()).sum())
+            results.append(_result(f'{col}: in [{spec.min}, {spec.max}]', 'error', failures,
+                                   {'min': float(lows[col]), 'max': float(highs[col])}))
+        if spec.values is not None:
+            bad = ~series.isin(spec.values) & series.notna()
+            results.append(_result(f'{col}: in {spec.values}', 'error', bad.sum(), _sample(series[bad].unique())))
+        if spec.pattern is not None:
+            bad = ~series.astype(str).str.fullmatch(spec.pattern)
+            results.append(_result(f'{col}: matches {spec.pattern}', 'error', bad.sum(), _sample(series[bad])))
+    return results
+
+
+def _key_frame(df, columns):
+    # Categorical keys compare as strings across tables
+    return pd.DataFrame({col: df[col].astype(str) if not pd.api.types.is_numeric_dtype(df[col]) else df[col]
+                         for col in columns})
+
+
+def _check_rule(df, rule, load):
+    if isinstance(rule, Unique):
+        rows = df.query(rule.where) if rule.where else df
+        duplicated = rows.duplicated(rule.columns, keep=False)
+        return _result(str(rule), rule.severity, duplicated.sum(),
+                       _sample(rows.loc[duplicated, rule.columns].drop_duplicates().itertuples(index=False, name=None)))
+    if isinstance(rule, Reference):
+        rows = df.query(rule.where) if rule.where else df
+        keys = _key_frame(rows, rule.columns)
+        target = load(rule.table, rule.target_columns)
+        target = _key_frame(target, rule.target_columns).drop_duplicates()
+        target.columns = rule.columns
+        found = keys.merge(target, how='left', on=rule.columns, indicator=True)['_merge'].to_numpy() == 'both'
+        return _result(str(rule), rule.severity, (~found).sum(),
+                       _sample(keys.loc[~found].itertuples(index=False, name=None)))
+    if isinstance(rule, Check):
+        ok = df.eval(rule.expr, engine='python' if df.empty else None)
+        return _result(str(rule), rule.severity, (~ok).sum(), _sample(df.index[~ok.to_numpy()]))
+    if isinstance(rule, Lookup):
+        values = df.loc[df[rule.key_column] == rule.key, rule.column]
+        if values.empty:
+            return _result(str(rule), rule.severity, 1, 'row not found')
+        value = float(values.iloc[0])
+        low = -np.inf if rule.min is None else rule.min
+        high = np.inf if rule.max is None else rule.max
+        return _result(str(rule), rule.severity, int(not low <= value <= high), value)
+    raise TypeError(f"Unknown rule {rule!r}")
+
+
+def validate_table(name, df=None, frames=None, rows_only=False):
+    # Report for one table; df defaults to the columnar store copy. Reference
+    # targets come from frames when given (e.g. freshly built stages).
+    # rows_only keeps the per-row checks (columns, Check rules) and skips the
+    # whole-table ones, for a batch of rows about to be added to the table.
+    frames = frames or {}
+    schema = SCHEMAS[name]
+    start = time.perf_counter()
+    # In-memory frames get the store's dtypes (and FIPS from GEO_ID) first
+    df = load_table(name) if df is None else compact_dtypes(df)
+
+    def load(table, columns):
+        if table in frames:
+            return compact_dtypes(frames[table])[columns]
+        return load_table(table, columns=columns)
+
+    checks = [] if rows_only else [
+        _result(f'at least {schema.min_rows} rows', 'error', int(len(df) < schema.min_rows), len(df))]
+    checks += _check_columns(df, schema)
+    for rule in schema.rules:
+        if rows_only and not isinstance(rule, Check):
+            continue
+        try:
+            checks.append(_check_rule(df, rule, load))
+        except (KeyError, pd.errors.UndefinedVariableError) as e:
+            # A rule over missing columns fails instead of aborting the table
+            checks.append(_result(str(rule), 'error', 1, f'{type(e).__name__}: {e}'))
+    return {
+        'rows': len(df),
+        'passed': all(check['status'] != 'fail' for check in checks),
+        'warnings': sum(check['status'] == 'warn' for check in checks),
+        'seconds': round(time.perf_counter() - start, 4),
+        'checks': checks,
+    }
+
+
+def validate(names=None, frames=None, max_workers=None, rows_only=False):
+    # Validate tables concurrently (threads: the work is Arrow/pandas kernels
+    # on memory-mapped data); frames maps table name -> DataFrame to check
+    # instead of the stored copy. Returns a JSON-serializable report.
+    frames = frames or {}
+    names = list(names or SCHEMAS)
+    unknown = [name for name in names if name not in SCHEMAS]
+    if unknown:
+        raise ValueError(f"No schema for {unknown}. Choose from {list(SCHEMAS)}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(names) or 1) as pool:
+        futures = {name: pool.submit(validate_table, name, frames.get(name), frames, rows_only) for name in names}
+        tables = {name: future.result() for name, future in futures.items()}
+    return {
+        'passed': all(table['passed'] for table in tables.values()),
+        'seconds': round(time.perf_counter() - start, 4),
+        'tables': tables,
+    }
+
+
+def failures(report):
+    # (table, check) for every failed check
+    return [(name, check) for name, table in report['tables'].items()
+            for check in table['checks'] if check['status'] == 'fail']
+
+
+def print_report(report, verbose=False):
+    for name, table in report['tables'].items():
+        status = 'PASS' if table['passed'] else 'FAIL'
+        print(f"{status} {name:14s} {table['rows']:6d} rows, {len(table['checks'])} checks, "
+              f"{table['warnings']} warnings ({table['seconds'] * 1000:.0f} ms)")
+        for check in table['checks']:
+            if verbose or check['status'] != 'pass':
+                count = f" ({check['failures']} failing)" if check['failures'] else ''
+                detail = f" {check['detail']}" if 'detail' in check else ''
+                print(f"  {check['status'].upper():4s} {check['check']}{count}{detail}")
+    print(f"{'Validation passed' if report['passed'] else 'Validation FAILED'} in {report['seconds']:.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate the cleaned datasets and main-dataset.csv")
+    parser.add_argument('tables', nargs='*', help=f"Tables to validate (default: all). One of {list(SCHEMAS)}")
+    parser.add_argument('--json', default=None, help="write the report as JSON to this path ('-' for stdout)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="list passing checks too")
+    args = parser.parse_args()
+
+    report = validate(args.tables)
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        print_report(report, args.verbose)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=1)
+            print(f"Saved report to '{args.json}'")
+    sys.exit(0 if report['passed'] else 1)